@@ -1,17 +1,20 @@
 from flask import Flask, render_template, request, jsonify, session, Response
 from flask_cors import CORS
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
 import os
 import secrets
 from functools import wraps
+from urllib.parse import quote
 from datetime import timedelta
-import subprocess
 import time
 import json
+import codecs
+import queue
 import pty
-import select
+import signal
 import struct
-import fcntl
-import termios
+import threading
 
 # Import modules
 from modules.auth import AuthManager
@@ -19,8 +22,18 @@ from modules.storage import StorageManager
 from modules.system import SystemManager
 from modules.process import ProcessManager
 from modules.terminal import TerminalManager
+from modules.tmux_client import TmuxClient
 from modules.docker_mgr import DockerManager
 from modules.app_control import AppController
+from modules.metrics_exporter import MetricsExporter
+from modules.process_stream import ProcessStream
+from modules.storage_watch import StorageWatcher
+from modules.jobs import JobManager
+from modules.disk_usage import DiskUsageAnalyzer
+from modules.file_index import FileIndex
+from modules.file_browser import FileBrowser
+from modules.config_cache import ConfigWatcher
+from modules.pty_reactor import PtyReactor, pack_frame, iter_frames, FRAME_INPUT, FRAME_RESIZE
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)
@@ -28,19 +41,78 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)
 CORS(app)
+sock = Sock(app)
 
 # Initialize managers
 auth_mgr = AuthManager('config/users.csv')
 storage_mgr = StorageManager()
 system_mgr = SystemManager()
-process_mgr = ProcessManager()
-terminal_mgr = TerminalManager('config/settings.ini')
+process_mgr = ProcessManager('config/settings.ini')
+# tmux commands go over one control-mode connection instead of a process each
+tmux = TmuxClient()
+terminal_mgr = TerminalManager('config/settings.ini', tmux)
 docker_mgr = DockerManager()
 app_ctrl = AppController()
 
-# Active terminal connections
+# Reload internal_uuids.txt / apps.json on inotify events instead of stat() per request
+config_watcher = ConfigWatcher([storage_mgr.internal_config, app_ctrl.apps_config])
+
+# Slow operations (mount/unmount) run as jobs, serialised per device
+job_mgr = JobManager()
+
+# Space analyzer for drives under the managed mount bases
+disk_usage = DiskUsageAnalyzer(storage_mgr, 'config/settings.ini')
+file_index = FileIndex(storage_mgr, 'config/settings.ini')
+file_browser = FileBrowser(storage_mgr)
+
+# Rescan storage only when mounts or block devices change, and tell clients
+storage_watcher = StorageWatcher(storage_mgr)
+
+# Live process panel: one sampling loop shared by all viewers
+process_stream = ProcessStream(process_mgr)
+
+# Prometheus snapshot, rebuilt in the background so scrapes never run commands
+metrics_exporter = MetricsExporter(system_mgr, storage_mgr, docker_mgr, app_ctrl, 'config/settings.ini')
+
+# Every terminal and htop PTY is read by one selector thread
+pty_reactor = PtyReactor('config/settings.ini')
+
+_workers_started = False
+_workers_lock = threading.Lock()
+
+def start_workers():
+    """Start the background threads once, in the process that serves requests.
+
+    Not at import time: the debug reloader imports this module in a watcher
+    process too, which would then run a second sampler, tmux client, crawler...
+    """
+    global _workers_started
+    with _workers_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+        tmux.start()
+        config_watcher.start()
+        storage_watcher.start()
+        file_index.start(storage_watcher)
+        # Sample host stats in the background so /api/system/stats never blocks
+        system_mgr.start_sampler()
+        metrics_exporter.start()
+        pty_reactor.start()
+
+@app.before_request
+def ensure_workers():
+    # Covers servers that import app without running __main__ (gunicorn)
+    if not _workers_started:
+        start_workers()
+
+# Active terminal connections (one per browser view), keyed by terminal_id
 active_terminals = {}
 
+# One shared tmux attachment per cockpit session, for all of its views
+terminal_attachments = {}
+attachments_lock = threading.Lock()
+
 def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -101,29 +173,206 @@ def get_storage():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/storage/events')
+@login_required
+def storage_events():
+    """SSE: mount table changes and block device hotplug"""
+    events = storage_watcher.subscribe()
+    
+    def generate():
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=30)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            storage_watcher.unsubscribe(events)
+    
+    return Response(generate(), mimetype='text/event-stream')
+
 @app.route('/api/storage/mount', methods=['POST'])
 @admin_required
 def mount_partition():
     data = request.json
     device = data.get('device')
     mount_type = data.get('type', 'private')
-    try:
-        result = storage_mgr.mount(device, mount_type)
-        return jsonify(result)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    if not device:
+        return jsonify({'error': 'Device required'}), 400
+    
+    job_id = job_mgr.submit('mount', device, storage_mgr.mount, device, mount_type,
+                            username=session['username'])
+    return jsonify({'success': True, 'job_id': job_id}), 202
 
 @app.route('/api/storage/unmount', methods=['POST'])
 @admin_required
 def unmount_partition():
     data = request.json
     device = data.get('device')
+    if not device:
+        return jsonify({'error': 'Device required'}), 400
+    
+    job_id = job_mgr.submit('unmount', device, storage_mgr.unmount, device,
+                            username=session['username'])
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+@app.route('/api/storage/usage', methods=['GET'])
+@admin_required
+def storage_usage():
+    """Size of a directory and its largest subdirectories, from the last scan"""
     try:
-        result = storage_mgr.unmount(device)
-        return jsonify(result)
+        data = disk_usage.get_usage(request.args.get('path'),
+                                    limit=request.args.get('limit', 50, type=int),
+                                    offset=request.args.get('offset', 0, type=int))
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/storage/usage/scan', methods=['POST'])
+@admin_required
+def storage_usage_scan():
+    data = request.json or {}
+    try:
+        status = disk_usage.start_scan(data.get('path'), full=bool(data.get('full')))
+        return jsonify(status), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/storage/usage/cancel', methods=['POST'])
+@admin_required
+def storage_usage_cancel():
+    data = request.json or {}
+    try:
+        if not disk_usage.cancel_scan(data.get('path')):
+            return jsonify({'error': 'No scan for this path'}), 404
+        return jsonify({'success': True})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/storage/search', methods=['GET'])
+@admin_required
+def storage_search():
+    """Filename search over the indexed drives (?q=, mode=prefix|substring)"""
+    try:
+        data = file_index.search(request.args.get('q'),
+                                 mode=request.args.get('mode', 'substring'),
+                                 limit=request.args.get('limit', 50, type=int))
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/files', methods=['GET'])
+@login_required
+def list_files():
+    """Browse the managed mount bases (private drives are admin only)"""
+    path = request.args.get('path')
+    is_admin = session.get('is_admin', False)
+    try:
+        if not path:
+            return jsonify(file_browser.list_bases(is_admin))
+        data = file_browser.list_dir(path,
+                                     limit=request.args.get('limit', 200, type=int),
+                                     offset=request.args.get('offset', 0, type=int),
+                                     is_admin=is_admin,
+                                     username=session.get('username'))
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except FileNotFoundError:
+        return jsonify({'error': 'Not found'}), 404
+    except NotADirectoryError:
+        return jsonify({'error': 'Not a directory'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/files/download', methods=['GET'])
+@login_required
+def download_file():
+    """Stream a file, honouring Range/If-Range so seeking and resumed downloads work"""
+    try:
+        f, info = file_browser.open_file(request.args.get('path'),
+                                         range_header=request.headers.get('Range'),
+                                         if_range=request.headers.get('If-Range'),
+                                         is_admin=session.get('is_admin', False),
+                                         username=session.get('username'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return jsonify({'error': 'Not found'}), 404
+    
+    headers = info['headers']
+    if info['status'] == 416:
+        return Response(status=416, headers=headers)
+    
+    # Inline only for allowlisted media; anything else is a download
+    inline = request.args.get('inline') and headers['Content-Type'] in file_browser.INLINE_TYPES
+    disposition = 'inline' if inline else 'attachment'
+    filename = os.path.basename(info['path'])
+    headers['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(filename)}"
+    
+    # The development server exposes the client socket, so send the range
+    # with sendfile() there; gunicorn's file wrapper does the same and stops
+    # at Content-Length. Anything else is streamed in bounded chunks.
+    sock = request.environ.get('werkzeug.socket')
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_browser.can_sendfile(sock):
+        body = file_browser.sendfile_range(f, sock, info['start'], info['length'])
+    elif file_wrapper and request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        body = file_wrapper(f, file_browser.CHUNK_SIZE)
+    else:
+        body = file_browser.iter_range(f, info['start'], info['length'])
+    
+    return Response(body, status=info['status'], headers=headers, direct_passthrough=True)
+
+# ==================== BACKGROUND JOBS ====================
+
+@app.route('/api/jobs', methods=['GET'])
+@admin_required
+def list_jobs():
+    return jsonify({'jobs': job_mgr.list()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    # ?wait=N blocks up to N seconds (max 60) for the job to finish
+    wait = min(max(request.args.get('wait', 0, type=float), 0), 60)
+    job = job_mgr.get(job_id, wait=wait)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/events')
+@admin_required
+def job_events():
+    """SSE: every job state change and progress message"""
+    events = job_mgr.subscribe()
+    
+    def generate():
+        try:
+            while True:
+                try:
+                    job = events.get(timeout=30)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(job)}\n\n"
+        finally:
+            job_mgr.unsubscribe(events)
+    
+    return Response(generate(), mimetype='text/event-stream')
+
 @app.route('/api/system/power', methods=['POST'])
 @admin_required
 def system_power():
@@ -143,12 +392,121 @@ def system_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/system/history', methods=['GET'])
+@login_required
+def system_history():
+    metric = request.args.get('metric', 'cpu')
+    try:
+        range_seconds = system_mgr.history.parse_duration(request.args.get('range'), 600)
+        step = system_mgr.history.parse_duration(request.args.get('step'), 1)
+    except ValueError:
+        return jsonify({'error': 'Invalid range or step'}), 400
+    
+    try:
+        data = system_mgr.get_history(metric, range_seconds, step)
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Scrapers don't log in: they need the bearer token from settings.ini
+    # (logged-in admins can look without it)
+    if not session.get('is_admin', False) and \
+            not metrics_exporter.is_authorized(request.headers.get('Authorization', '')):
+        return Response('Unauthorized', status=401)
+    return Response(metrics_exporter.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/processes', methods=['GET'])
 @login_required
 def get_processes():
+    args = request.args
+    try:
+        data = process_mgr.get_processes(
+            sort=args.get('sort', 'mem'),
+            order=args.get('order'),
+            user=args.get('user'),
+            name=args.get('name'),
+            name_regex=args.get('name_regex'),
+            min_cpu=args.get('min_cpu', type=float),
+            min_mem_mb=args.get('min_mem', type=float),
+            limit=args.get('limit', 50, type=int),
+            offset=args.get('offset', 0, type=int)
+        )
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/processes/stream')
+@login_required
+def process_stream_events():
+    """SSE: a full frame, then only added/removed/changed rows"""
+    # EventSource sends Last-Event-ID on reconnect; ?since= works for other clients
+    since = request.headers.get('Last-Event-ID', request.args.get('since'))
+    sub = process_stream.subscribe(since)
+    
+    def generate():
+        try:
+            while True:
+                try:
+                    frame = sub['queue'].get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {process_stream.event_id(frame)}\ndata: {json.dumps(frame)}\n\n"
+        finally:
+            process_stream.unsubscribe(sub)
+    
+    return Response(generate(), mimetype='text/event-stream')
+
+@app.route('/api/processes/tree', methods=['GET'])
+@login_required
+def get_process_tree():
+    root = request.args.get('root', type=int)
+    try:
+        data = process_mgr.get_tree(root=root)
+        if data is None:
+            return jsonify({'error': f'Process {root} not found'}), 404
+        return jsonify(data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/processes/aggregate', methods=['GET'])
+@login_required
+def get_process_aggregate():
+    try:
+        data = process_mgr.get_aggregate(
+            by=request.args.get('by', 'user'),
+            limit=request.args.get('limit', 50, type=int)
+        )
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/processes/<int:pid>', methods=['GET'])
+@login_required
+def get_process_detail(pid):
+    # cmdline, cwd and open files can hold secrets: non-admins only see their own processes
+    uid = None
+    if not session.get('is_admin', False):
+        import pwd
+        try:
+            uid = pwd.getpwnam(session['username']).pw_uid
+        except KeyError:
+            return jsonify({'error': 'You can only inspect your own processes'}), 403
     try:
-        data = process_mgr.get_processes()
+        data = process_mgr.get_process_detail(pid, uid=uid)
+        if data is None:
+            return jsonify({'error': f'Process {pid} not found'}), 404
         return jsonify(data)
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -164,13 +522,12 @@ def start_htop():
     htop_session = f"htop_{username}"
     
     # Kill existing htop session if any
-    subprocess.run(f"tmux kill-session -t {htop_session} 2>/dev/null", shell=True)
+    tmux.run(['kill-session', '-t', htop_session])
     
     # Create new tmux session running htop
-    create_cmd = f"tmux new-session -d -s {htop_session} htop"
-    result = subprocess.run(create_cmd, shell=True, capture_output=True)
+    _, _, code = tmux.run(['new-session', '-d', '-s', htop_session, 'htop'])
     
-    if result.returncode != 0:
+    if code != 0:
         return jsonify({'error': 'Failed to start htop'}), 500
     
     # Create terminal connection ID
@@ -188,8 +545,10 @@ def start_htop():
         'pid': pid,
         'fd': fd,
         'username': username,
-        'session_name': htop_session
+        'session_name': htop_session,
+        'pty_key': terminal_id
     }
+    pty_reactor.register(terminal_id, fd, on_eof=cleanup_htop, on_resync=lambda key: redraw_pty(pid))
     
     return jsonify({'terminal_id': terminal_id, 'success': True})
 
@@ -199,35 +558,7 @@ def htop_read(terminal_id):
     if terminal_id not in active_htop_sessions:
         return Response('Terminal not found', status=404)
     
-    def generate():
-        term_data = active_htop_sessions.get(terminal_id)
-        if not term_data:
-            return
-        
-        fd = term_data['fd']
-        
-        try:
-            while terminal_id in active_htop_sessions:
-                r, _, _ = select.select([fd], [], [], 0.1)
-                
-                if r:
-                    try:
-                        data = os.read(fd, 4096)
-                        if data:
-                            yield f"data: {json.dumps({'output': data.decode('utf-8', errors='ignore')})}\n\n"
-                        else:
-                            break
-                    except OSError:
-                        break
-                else:
-                    yield f"data: {json.dumps({'keepalive': True})}\n\n"
-        except:
-            pass
-        finally:
-            if terminal_id in active_htop_sessions:
-                cleanup_htop(terminal_id)
-    
-    return Response(generate(), mimetype='text/event-stream')
+    return pty_event_stream(active_htop_sessions, terminal_id, cleanup_htop)
 
 @app.route('/api/htop/write/<terminal_id>', methods=['POST'])
 @login_required
@@ -236,11 +567,9 @@ def htop_write(terminal_id):
         return jsonify({'error': 'Terminal not found'}), 404
     
     data = request.json.get('data', '')
-    term_data = active_htop_sessions[terminal_id]
-    fd = term_data['fd']
     
     try:
-        os.write(fd, data.encode('utf-8'))
+        pty_reactor.write(active_htop_sessions[terminal_id]['pty_key'], data.encode('utf-8'))
         return jsonify({'success': True})
     except:
         return jsonify({'error': 'Write failed'}), 500
@@ -254,12 +583,8 @@ def htop_resize(terminal_id):
     rows = request.json.get('rows', 24)
     cols = request.json.get('cols', 80)
     
-    term_data = active_htop_sessions[terminal_id]
-    fd = term_data['fd']
-    
     try:
-        size = struct.pack('HHHH', rows, cols, 0, 0)
-        fcntl.ioctl(fd, termios.TIOCSWINSZ, size)
+        pty_reactor.resize(active_htop_sessions[terminal_id]['pty_key'], rows, cols)
         return jsonify({'success': True})
     except:
         return jsonify({'error': 'Resize failed'}), 500
@@ -271,9 +596,11 @@ def stop_htop(terminal_id):
     return jsonify({'success': True})
 
 def cleanup_htop(terminal_id):
-    if terminal_id in active_htop_sessions:
-        term_data = active_htop_sessions[terminal_id]
+    # pop() so a viewer leaving and the PTY closing can both call this safely
+    term_data = active_htop_sessions.pop(terminal_id, None)
+    if term_data:
         session_name = term_data['session_name']
+        pty_reactor.unregister(terminal_id)
         
         try:
             os.close(term_data['fd'])
@@ -282,9 +609,7 @@ def cleanup_htop(terminal_id):
             pass
         
         # Kill the tmux session
-        subprocess.run(f"tmux kill-session -t {session_name} 2>/dev/null", shell=True)
-        
-        del active_htop_sessions[terminal_id]
+        tmux.run(['kill-session', '-t', session_name])
 
 # ==================== TERMINAL SESSION MANAGEMENT ====================
 
@@ -304,6 +629,9 @@ def create_session():
     username = session['username']
     try:
         result = terminal_mgr.create_session(username)
+        if result.get('success'):
+            # Session names are reused: forget the output of an earlier one
+            pty_reactor.drop_history(result['session_name'])
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -315,6 +643,8 @@ def delete_session():
     session_name = request.json.get('session_name')
     try:
         result = terminal_mgr.delete_session(username, session_name)
+        if result.get('success'):
+            pty_reactor.drop_history(session_name)
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -334,25 +664,48 @@ def connect_terminal():
     if not session_name.startswith(prefix):
         return jsonify({'error': 'Invalid session name'}), 403
     
-    # Check if tmux session exists
-    check_cmd = f"tmux has-session -t {session_name} 2>/dev/null"
-    result = subprocess.run(check_cmd, shell=True, capture_output=True)
-    
-    if result.returncode != 0:
+    # Check if tmux session exists (from the cached session list)
+    if not tmux.has_session(session_name):
         return jsonify({'error': 'Session does not exist'}), 404
     
     # Create a unique terminal connection ID
     terminal_id = f"{session_name}_{secrets.token_hex(8)}"
     
+    # First view since the server started: snapshot the screen to begin the
+    # scrollback with. capture-pane runs tmux, so keep it outside the lock
+    seed = None
+    if session_name not in terminal_attachments and not pty_reactor.has_history(session_name):
+        seed = capture_screen(session_name)
+    
+    with attachments_lock:
+        # Views of the same session share one attachment (laptop and phone, several tabs)
+        attachment = terminal_attachments.get(session_name)
+        if not attachment:
+            try:
+                attachment = attach_session(username, session_name, seed)
+            except KeyError:
+                return jsonify({'error': f'User {username} not found on system'}), 404
+        attachment['viewers'].add(terminal_id)
+        active_terminals[terminal_id] = {
+            'username': username,
+            'session_name': session_name,
+            'pty_key': session_name
+        }
+    
+    return jsonify({'terminal_id': terminal_id, 'success': True})
+
+def attach_session(username, session_name, seed=None):
+    """Fork a PTY running `tmux attach` as the user; caller holds attachments_lock.
+
+    seed (a capture_screen() snapshot) begins the scrollback unless another
+    view already filled it.
+    """
     # Get user's home directory and UID/GID
     import pwd
-    try:
-        user_info = pwd.getpwnam(username)
-        user_home = user_info.pw_dir
-        user_uid = user_info.pw_uid
-        user_gid = user_info.pw_gid
-    except KeyError:
-        return jsonify({'error': f'User {username} not found on system'}), 404
+    user_info = pwd.getpwnam(username)
+    user_home = user_info.pw_dir
+    user_uid = user_info.pw_uid
+    user_gid = user_info.pw_gid
     
     # Fork a PTY and attach to tmux session
     pid, fd = pty.fork()
@@ -379,15 +732,40 @@ def connect_terminal():
             print(f"Failed to start terminal: {e}")
             os._exit(1)
     
-    # Parent process - store terminal info
-    active_terminals[terminal_id] = {
+    # Parent process - store attachment info
+    attachment = {
         'pid': pid,
         'fd': fd,
         'username': username,
-        'session_name': session_name
+        'session_name': session_name,
+        'viewers': set()
     }
-    
-    return jsonify({'terminal_id': terminal_id, 'success': True})
+    terminal_attachments[session_name] = attachment
+    if seed:
+        pty_reactor.seed_history(session_name, seed)  # no-op unless the scrollback is still empty
+    pty_reactor.register(session_name, fd, on_eof=lambda key: detach_session(key, pid),
+                         on_resync=lambda key: redraw_pty(pid), history=session_name)
+    return attachment
+
+def detach_session(session_name, pid):
+    """The tmux client exited: drop its attachment and every view of it"""
+    with attachments_lock:
+        attachment = terminal_attachments.get(session_name)
+        if not attachment or attachment['pid'] != pid:
+            return  # already replaced by a newer attachment
+        del terminal_attachments[session_name]
+        for terminal_id in attachment['viewers']:
+            active_terminals.pop(terminal_id, None)
+        pty_reactor.unregister(session_name)
+    close_attachment(attachment)
+
+def close_attachment(attachment):
+    # Unregistered from the reactor by the caller, under attachments_lock
+    try:
+        os.close(attachment['fd'])
+        os.kill(attachment['pid'], 15)  # SIGTERM makes the tmux client detach
+    except OSError:
+        pass
 
 @app.route('/api/terminal/read/<terminal_id>')
 @login_required
@@ -396,35 +774,31 @@ def terminal_read(terminal_id):
     if terminal_id not in active_terminals:
         return Response('Terminal not found', status=404)
     
+    return pty_event_stream(active_terminals, terminal_id, cleanup_terminal)
+
+def pty_event_stream(sessions, terminal_id, cleanup):
+    """SSE fallback: output from the reactor, a comment line only every 30s while idle"""
+    term_data = sessions.get(terminal_id)
+    sub = pty_reactor.subscribe(term_data['pty_key']) if term_data else None
+    if not sub:
+        return Response('Terminal not found', status=404)
+    
     def generate():
-        term_data = active_terminals.get(terminal_id)
-        if not term_data:
-            return
-        
-        fd = term_data['fd']
-        
+        # Characters split across two reads are completed by the next one
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
         try:
-            while terminal_id in active_terminals:
-                # Use select to wait for data
-                r, _, _ = select.select([fd], [], [], 0.1)
-                
-                if r:
-                    try:
-                        data = os.read(fd, 4096)
-                        if data:
-                            yield f"data: {json.dumps({'output': data.decode('utf-8', errors='ignore')})}\n\n"
-                        else:
-                            break
-                    except OSError:
-                        break
-                else:
-                    # Send keepalive
-                    yield f"data: {json.dumps({'keepalive': True})}\n\n"
-        except:
-            pass
+            while True:
+                data = sub.read(timeout=30)
+                if data is None:
+                    break
+                text = decoder.decode(data) if data else ''
+                if not text:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps({'output': text})}\n\n"
         finally:
-            if terminal_id in active_terminals:
-                cleanup_terminal(terminal_id)
+            pty_reactor.unsubscribe(sub)
+            cleanup(terminal_id)
     
     return Response(generate(), mimetype='text/event-stream')
 
@@ -436,11 +810,9 @@ def terminal_write(terminal_id):
         return jsonify({'error': 'Terminal not found'}), 404
     
     data = request.json.get('data', '')
-    term_data = active_terminals[terminal_id]
-    fd = term_data['fd']
     
     try:
-        os.write(fd, data.encode('utf-8'))
+        pty_reactor.write(active_terminals[terminal_id]['pty_key'], data.encode('utf-8'))
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': f'Write failed: {str(e)}'}), 500
@@ -455,16 +827,46 @@ def terminal_resize(terminal_id):
     rows = request.json.get('rows', 24)
     cols = request.json.get('cols', 80)
     
-    term_data = active_terminals[terminal_id]
-    fd = term_data['fd']
-    
     try:
-        size = struct.pack('HHHH', rows, cols, 0, 0)
-        fcntl.ioctl(fd, termios.TIOCSWINSZ, size)
+        # Views of a shared attachment: the latest resize wins, as with tmux's window-size latest
+        pty_reactor.resize(active_terminals[terminal_id]['pty_key'], rows, cols)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': f'Resize failed: {str(e)}'}), 500
 
+@app.route('/api/terminal/stats', methods=['GET'])
+@login_required
+def terminal_stats():
+    """Output buffer depth and stall counters for the caller's terminals (all of them for admins)"""
+    username = session['username']
+    is_admin = session.get('is_admin', False)
+    terminals = {}
+    for sessions in (terminal_attachments, active_htop_sessions):
+        for key, term_data in list(sessions.items()):
+            if not is_admin and term_data['username'] != username:
+                continue
+            stats = pty_reactor.terminal_stats(key)
+            if stats:
+                stats['session_name'] = term_data['session_name']
+                stats['terminal_ids'] = sorted(term_data.get('viewers', [key]))
+                terminals[key] = stats
+    return jsonify({'reactor': pty_reactor.stats(), 'terminals': terminals})
+
+def capture_screen(session_name):
+    """The visible pane of a tmux session, with colours, as terminal output"""
+    stdout, _, code = tmux.run(['capture-pane', '-p', '-e', '-t', session_name])
+    if code != 0:
+        return b''
+    lines = stdout.encode('utf-8').split(b'\n')
+    return b'\x1b[H\x1b[2J' + b'\r\n'.join(lines) + b'\x1b[0m'
+
+def redraw_pty(pid):
+    """Resync: SIGWINCH makes the attached tmux client repaint the whole screen"""
+    try:
+        os.kill(pid, signal.SIGWINCH)
+    except ProcessLookupError:
+        pass
+
 @app.route('/api/terminal/disconnect/<terminal_id>', methods=['POST'])
 @login_required
 def disconnect_terminal(terminal_id):
@@ -473,19 +875,69 @@ def disconnect_terminal(terminal_id):
     return jsonify({'success': True, 'message': 'Disconnected (session still running)'})
 
 def cleanup_terminal(terminal_id):
-    """Clean up terminal connection (doesn't kill tmux session)"""
-    if terminal_id in active_terminals:
-        term_data = active_terminals[terminal_id]
+    """Clean up one terminal view; the attachment detaches with its last view (tmux session keeps running)"""
+    with attachments_lock:
+        term_data = active_terminals.pop(terminal_id, None)
+        attachment = terminal_attachments.get(term_data['session_name']) if term_data else None
+        if not attachment:
+            return
+        attachment['viewers'].discard(terminal_id)
+        if attachment['viewers']:
+            return  # still being watched elsewhere
+        del terminal_attachments[attachment['session_name']]
+        pty_reactor.unregister(attachment['session_name'])
+    close_attachment(attachment)
+
+# ==================== WEBSOCKET TRANSPORT ====================
+# One socket per terminal view carrying length-prefixed binary frames (see
+# modules/pty_reactor.py): FRAME_OUTPUT from the server, FRAME_INPUT and
+# FRAME_RESIZE from the browser. The SSE /read and POST /write, /resize
+# routes above remain as a fallback.
+
+def _serve_pty_websocket(ws, sessions, terminal_id, cleanup):
+    term_data = sessions.get(terminal_id)
+    if 'username' not in session or not term_data or term_data['username'] != session['username']:
+        ws.close(reason=1008, message='Terminal not found')
+        return
+    
+    def close_socket():
         try:
-            os.close(term_data['fd'])
-            # Send Ctrl+B then D to detach from tmux
-            try:
-                os.kill(term_data['pid'], 15)  # SIGTERM to gracefully exit
-            except:
-                pass
-        except:
+            ws.close()
+        except ConnectionClosed:
             pass
-        del active_terminals[terminal_id]
+    
+    # Output is written to the socket by the reactor; this thread only handles input
+    pty_key = term_data['pty_key']
+    sub = pty_reactor.subscribe(pty_key, sock=ws.sock, on_close=close_socket)
+    if not sub:
+        close_socket()
+        return
+    
+    try:
+        while True:
+            message = ws.receive()
+            if isinstance(message, str):
+                message = pack_frame(FRAME_INPUT, message.encode('utf-8'))
+            for frame_type, payload in iter_frames(message or b''):
+                if frame_type == FRAME_INPUT:
+                    pty_reactor.write(pty_key, payload)
+                elif frame_type == FRAME_RESIZE and len(payload) >= 4:
+                    rows, cols = struct.unpack('>HH', payload[:4])
+                    pty_reactor.resize(pty_key, rows, cols)
+    except (ConnectionClosed, OSError, KeyError):
+        pass
+    finally:
+        pty_reactor.unsubscribe(sub)
+        cleanup(terminal_id)
+
+@sock.route('/ws/terminal/<terminal_id>')
+def terminal_websocket(ws, terminal_id):
+    """Input, output and resize for a terminal over one socket"""
+    _serve_pty_websocket(ws, active_terminals, terminal_id, cleanup_terminal)
+
+@sock.route('/ws/htop/<terminal_id>')
+def htop_websocket(ws, terminal_id):
+    _serve_pty_websocket(ws, active_htop_sessions, terminal_id, cleanup_htop)
 
 # ==================== DOCKER MANAGEMENT ====================
 
@@ -537,4 +989,6 @@ if __name__ == '__main__':
     os.makedirs('config', exist_ok=True)
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static', exist_ok=True)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_workers()     # reloader child, the serving process (the parent only watches files)
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
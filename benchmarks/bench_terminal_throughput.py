@@ -0,0 +1,141 @@
+"""Measure terminal output throughput from the PTY to the client.
+
+Runs `cat` of a generated text file in a PTY and streams it to a client
+over a local HTTP server, end to end:
+
+  legacy   the old per-connection loop: select() every 100ms, 4 KB reads,
+           one JSON SSE event per read
+  reactor  PtyReactor (coalesced 64 KB reads) + binary frames over a WebSocket
+
+    python3 benchmarks/bench_terminal_throughput.py          # 32 MB
+    python3 benchmarks/bench_terminal_throughput.py 128      # custom size (MB)
+"""
+import json
+import os
+import pty
+import select
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simple_websocket
+from flask import Flask, Response
+from flask_sock import Sock
+from werkzeug.serving import make_server
+from modules.pty_reactor import PtyReactor, iter_frames
+
+PORT = 5098
+
+
+def make_text_file(size_mb):
+    line = b''.join(bytes([33 + (i % 90)]) for i in range(99)) + b'\n'
+    path = os.path.join(tempfile.mkdtemp(), 'output.txt')
+    with open(path, 'wb') as f:
+        for _ in range(size_mb * 1024 * 1024 // len(line)):
+            f.write(line)
+    return path
+
+
+def spawn_cat(path):
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.execvp('cat', ['cat', path])
+    return pid, fd
+
+
+def build_app(path, reactor):
+    app = Flask(__name__)
+    sock = Sock(app)
+
+    @app.route('/legacy')
+    def legacy():
+        pid, fd = spawn_cat(path)
+
+        def generate():
+            try:
+                while True:
+                    r, _, _ = select.select([fd], [], [], 0.1)
+                    if r:
+                        try:
+                            data = os.read(fd, 4096)
+                        except OSError:
+                            break
+                        if not data:
+                            break
+                        yield f"data: {json.dumps({'output': data.decode('utf-8', errors='ignore')})}\n\n"
+                    else:
+                        yield f"data: {json.dumps({'keepalive': True})}\n\n"
+            finally:
+                os.close(fd)
+                os.waitpid(pid, 0)
+
+        return Response(generate(), mimetype='text/event-stream')
+
+    @sock.route('/ws')
+    def websocket(ws):
+        pid, fd = spawn_cat(path)
+        done = threading.Event()
+        reactor.register('bench', fd, on_eof=lambda key: done.set())
+        sub = reactor.subscribe('bench', sock=ws.sock, on_close=done.set)
+        done.wait()
+        while not sub.closed:
+            time.sleep(0.01)    # let the last flush go out
+        reactor.unsubscribe(sub)
+        reactor.unregister('bench')
+        os.close(fd)
+        os.waitpid(pid, 0)
+
+    return app
+
+
+def run_legacy():
+    received = messages = 0
+    started = time.perf_counter()
+    with urllib.request.urlopen(f'http://127.0.0.1:{PORT}/legacy') as response:
+        for line in response:
+            if line.startswith(b'data: '):
+                event = json.loads(line[6:])
+                messages += 1
+                received += len(event.get('output', '').encode('utf-8'))
+    return received, messages, time.perf_counter() - started
+
+
+def run_reactor():
+    received = messages = 0
+    started = time.perf_counter()
+    ws = simple_websocket.Client.connect(f'ws://127.0.0.1:{PORT}/ws')
+    try:
+        while True:
+            message = ws.receive()
+            messages += 1
+            for _, payload in iter_frames(message):
+                received += len(payload)
+    except simple_websocket.ConnectionClosed:
+        pass
+    return received, messages, time.perf_counter() - started
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    path = make_text_file(size_mb)
+    reactor = PtyReactor()
+    reactor.start()
+
+    server = make_server('127.0.0.1', PORT, build_app(path, reactor), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{size_mb} MB of text through a PTY to a local client")
+    print(f"{'transport':<10} {'MB/s':>8} {'messages':>10} {'avg bytes':>10}")
+    for name, run in (('legacy', run_legacy), ('reactor', run_reactor)):
+        received, messages, elapsed = run()
+        print(f"{name:<10} {received / elapsed / 1e6:>8.1f} {messages:>10} {received // max(messages, 1):>10}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
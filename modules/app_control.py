@@ -2,11 +2,17 @@ import subprocess
 import os
 import json
 
+try:
+    from modules.config_cache import ConfigFile
+except ImportError:  # standalone test: python3 modules/app_control.py
+    from config_cache import ConfigFile
+
 class AppController:
     def __init__(self):
         # User must configure app control commands in config/apps.json
         self.config_file = 'config/apps.json'
         self._ensure_config_exists()
+        self.apps_config = ConfigFile(self.config_file, self._parse_apps, default=[])
     
     def _ensure_config_exists(self):
         if not os.path.exists(self.config_file):
@@ -37,9 +43,15 @@ class AppController:
             return '', 'Command timeout', 1
     
     def _load_apps(self):
-        with open(self.config_file, 'r') as f:
-            config = json.load(f)
-        return config.get('apps', [])
+        return self.apps_config.get()
+    
+    def _parse_apps(self, text):
+        # Raising keeps the previously loaded apps in place
+        config = json.loads(text)
+        apps = config.get('apps', [])
+        if not isinstance(apps, list) or not all(isinstance(a, dict) and 'name' in a for a in apps):
+            raise ValueError('"apps" must be a list of objects with a "name"')
+        return apps
     
     def list_apps(self):
         apps = self._load_apps()
@@ -0,0 +1,180 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+
+class ConfigFile:
+    """A config file parsed once and re-parsed only after it changes.
+
+    get() revalidates with one os.stat (mtime, ctime, size, inode). While a
+    ConfigWatcher covers the file even that stat is skipped until inotify
+    reports a change. If an edit fails to parse, the last good value is kept
+    and a warning is printed once.
+    """
+
+    def __init__(self, path, parser, default=None):
+        self.path = path
+        self.parser = parser
+        self.default = default
+        self.watched = False
+
+        self._value = default
+        self._key = None
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.watched and not self._dirty:
+                return self._value
+            self._dirty = False
+
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._key = None
+                self._value = self.default
+                return self._value
+
+            key = (st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_ino)
+            if key == self._key:
+                return self._value
+            self._key = key
+
+            try:
+                with open(self.path, 'r') as f:
+                    self._value = self.parser(f.read())
+            except Exception as e:
+                print(f"Warning: {self.path} is invalid, keeping the previous version: {e}")
+            return self._value
+
+    def mark_dirty(self):
+        with self._lock:
+            self._dirty = True
+
+
+class ConfigWatcher:
+    """Marks ConfigFiles dirty from inotify events on their directories.
+
+    Optional: without inotify (non-Linux, or the watch limit reached) the
+    files simply keep revalidating with os.stat on every get().
+    """
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, files):
+        self.files = list(files)
+        self._thread = None
+
+    def start(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+        if fd < 0:
+            return False
+
+        # Watch directories, not files: editors and atomic writes replace the file
+        by_dir = {}
+        for config in self.files:
+            directory = os.path.dirname(os.path.abspath(config.path))
+            by_dir.setdefault(directory, []).append(config)
+
+        watches = {}
+        for directory, configs in by_dir.items():
+            wd = libc.inotify_add_watch(fd, directory.encode(), self.WATCH_MASK)
+            if wd < 0:
+                continue
+            watches[wd] = {os.path.basename(c.path): c for c in configs}
+
+        if not watches:
+            os.close(fd)
+            return False
+
+        for configs in watches.values():
+            for config in configs.values():
+                config.mark_dirty()
+                config.watched = True
+
+        self._thread = threading.Thread(target=self._watch, args=(fd, watches),
+                                        name='config-watcher', daemon=True)
+        self._thread.start()
+        return True
+
+    def _watch(self, fd, watches):
+        try:
+            while True:
+                select.select([fd], [], [])
+                try:
+                    data = os.read(fd, 65536)
+                except BlockingIOError:
+                    continue
+
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+                    name = data[offset + 16:offset + 16 + length].rstrip(b'\0').decode('utf-8', 'replace')
+                    offset += 16 + length
+
+                    if mask & self.IN_Q_OVERFLOW:
+                        for configs in watches.values():
+                            for config in configs.values():
+                                config.mark_dirty()
+                    elif mask & self.IN_IGNORED:
+                        # Directory went away - fall back to stat for its files
+                        for config in watches.pop(wd, {}).values():
+                            config.watched = False
+                            config.mark_dirty()
+                    else:
+                        config = watches.get(wd, {}).get(name)
+                        if config:
+                            config.mark_dirty()
+        finally:
+            for configs in watches.values():
+                for config in configs.values():
+                    config.watched = False
+            os.close(fd)
+
+
+# Standalone test
+if __name__ == '__main__':
+    import json
+    import tempfile
+    import time
+
+    print("Testing ConfigFile...")
+    path = os.path.join(tempfile.mkdtemp(), 'apps.json')
+    with open(path, 'w') as f:
+        json.dump({'apps': [{'name': 'one'}]}, f)
+
+    config = ConfigFile(path, json.loads, default={})
+    watcher = ConfigWatcher([config])
+    print(f"  inotify: {watcher.start()}")
+    print(f"  initial: {config.get()}")
+
+    with open(path, 'w') as f:
+        f.write('{"apps": [')   # broken edit
+    time.sleep(0.1)
+    print(f"  after invalid edit: {config.get()}")
+
+    with open(path, 'w') as f:
+        json.dump({'apps': [{'name': 'two'}]}, f)
+    time.sleep(0.1)
+    print(f"  after fix: {config.get()}")
+
+    started = time.perf_counter()
+    for _ in range(100000):
+        config.get()
+    print(f"  cached get: {(time.perf_counter() - started) * 10:.2f}us")
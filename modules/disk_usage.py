@@ -0,0 +1,466 @@
+import configparser
+import hashlib
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER,
+    name TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    mtime_ns INTEGER,
+    own_size INTEGER NOT NULL DEFAULT 0,
+    own_files INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    files INTEGER NOT NULL DEFAULT 0,
+    gen INTEGER NOT NULL DEFAULT 0,
+    linked_size INTEGER NOT NULL DEFAULT 0,
+    mount INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS dirs_parent_name ON dirs(parent, name);
+CREATE INDEX IF NOT EXISTS dirs_parent_size ON dirs(parent, size DESC);
+CREATE INDEX IF NOT EXISTS dirs_depth ON dirs(depth);
+CREATE INDEX IF NOT EXISTS dirs_mount ON dirs(mount) WHERE mount = 1;
+CREATE TABLE IF NOT EXISTS links (
+    dir INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (dir, inode)
+);
+CREATE INDEX IF NOT EXISTS links_inode ON links(inode, dir);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+class DiskUsageAnalyzer:
+    """Per-directory size tree for mounted drives, kept in one SQLite file per root.
+
+    Only directories are stored (own file bytes/count plus subtree totals), so
+    the tree stays small even for millions of files. Directories are listed in
+    parallel with os.scandir on a thread pool; a single coordinator thread owns
+    the database.
+
+    Rescans reuse the stored file totals and child list of every directory whose
+    mtime is unchanged. A directory's mtime only changes when entries are added,
+    removed or renamed in it, so each subdirectory is still stat()ed - but
+    unchanged ones cost one stat instead of a scandir plus a stat per file.
+    (Files rewritten in place are only picked up by a full rescan.)
+
+    Hard-linked files are kept per directory as (inode, size) and assigned to
+    one directory when totals are computed, so they count once even when some
+    of their directories were reused. Other filesystems mounted inside the tree
+    are not descended into; they are reported as skipped_mounts.
+
+    Progress is committed as the scan goes; an interrupted scan (cancel, restart)
+    resumes where it stopped instead of starting over.
+    """
+
+    def __init__(self, storage_mgr, config_file=None):
+        self.storage_mgr = storage_mgr
+        self.cache_dir = 'cache/du'
+        self.workers = 8
+        self.commit_interval = 2.0
+        self._load_config(config_file)
+
+        self._scans = {}                # root -> status dict of the running/last scan
+        self._cancel = {}               # root -> threading.Event
+        self._lock = threading.Lock()
+
+    def _load_config(self, config_file):
+        if not config_file:
+            return
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        self.cache_dir = config.get('disk_usage', 'cache_dir', fallback=self.cache_dir)
+        self.workers = config.getint('disk_usage', 'workers', fallback=self.workers)
+
+    def _resolve(self, path):
+        return self.storage_mgr.resolve_managed_path(path)
+
+    def _db_path(self, root):
+        digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{digest}.db')
+
+    def _connect(self, root):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        db = sqlite3.connect(self._db_path(root), timeout=10)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        columns = {row[1] for row in db.execute('PRAGMA table_info(dirs)')}
+        if columns and 'linked_size' not in columns:
+            # Older caches folded hard links into own_size: add the columns and
+            # forget the mtimes so the next scan lists every directory again
+            with db:
+                db.execute('ALTER TABLE dirs ADD COLUMN linked_size INTEGER NOT NULL DEFAULT 0')
+                db.execute('ALTER TABLE dirs ADD COLUMN mount INTEGER NOT NULL DEFAULT 0')
+                db.execute('UPDATE dirs SET mtime_ns = NULL')
+        db.executescript(SCHEMA)
+        return db
+
+    def _roots(self):
+        """Scanned roots, longest first so nested roots win"""
+        with self._lock:
+            roots = list(self._scans)
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.db'):
+                    continue
+                try:
+                    db = sqlite3.connect(os.path.join(self.cache_dir, name), timeout=10)
+                    try:
+                        row = db.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+                    finally:
+                        db.close()
+                except sqlite3.Error:
+                    continue
+                if row and row[0] not in roots:
+                    roots.append(row[0])
+        return sorted(roots, key=len, reverse=True)
+
+    # ---------- scanning ----------
+
+    def start_scan(self, path, full=False):
+        """Start (or resume) a background scan of path; returns its status"""
+        root = self._resolve(path)
+        if not os.path.isdir(root):
+            raise ValueError(f'Not a directory: {path}')
+
+        with self._lock:
+            current = self._scans.get(root)
+            if current and current['state'] == 'running':
+                return dict(current)
+            status = {
+                'root': root,
+                'state': 'running',
+                'full': bool(full),
+                'resumed': False,
+                'dirs_scanned': 0,
+                'dirs_reused': 0,
+                'files_scanned': 0,
+                'mounts_skipped': 0,
+                'errors': 0,
+                'started_at': time.time(),
+                'finished_at': None,
+                'error': None
+            }
+            self._scans[root] = status
+            self._cancel[root] = threading.Event()
+
+        threading.Thread(target=self._scan, args=(root, status, full), name='disk-usage', daemon=True).start()
+        return dict(status)
+
+    def cancel_scan(self, path):
+        root = self._resolve(path)
+        with self._lock:
+            event = self._cancel.get(root)
+            if event:
+                event.set()
+            return root in self._scans
+
+    def get_status(self, path):
+        root = self._resolve(path)
+        with self._lock:
+            status = self._scans.get(root)
+            return dict(status) if status else None
+
+    def _scan(self, root, status, full):
+        db = None
+        try:
+            db = self._connect(root)
+            meta = dict(db.execute('SELECT key, value FROM meta'))
+            generation = int(meta.get('generation', 0))
+            resume = meta.get('state') == 'running' and not full
+            if resume:
+                status['resumed'] = True
+            else:
+                generation += 1
+            with db:
+                db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+                    ('root', root), ('generation', generation), ('state', 'running'),
+                    ('started_at', status['started_at'])
+                ])
+
+            completed = self._walk(db, root, generation, status, full, resume)
+            if not completed:
+                status['state'] = 'cancelled'
+                return
+
+            with db:
+                # Directories not seen in this generation were deleted or moved
+                db.execute('DELETE FROM dirs WHERE gen != ?', (generation,))
+                db.execute('DELETE FROM links WHERE dir NOT IN (SELECT id FROM dirs)')
+                self._compute_totals(db)
+                db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+                    ('state', 'complete'), ('finished_at', time.time())
+                ])
+            status['state'] = 'complete'
+        except Exception as e:
+            status['state'] = 'failed'
+            status['error'] = str(e)
+        finally:
+            status['finished_at'] = time.time()
+            if db:
+                db.close()
+
+    def _walk(self, db, root, generation, status, full, resume):
+        cancel = self._cancel[root]
+        try:
+            root_dev = os.stat(root).st_dev
+        except OSError as e:
+            raise ValueError(f'Cannot read {root}: {e}')
+
+        row = db.execute('SELECT id, mtime_ns, gen FROM dirs WHERE parent IS NULL').fetchone()
+        if row is None:
+            root_id = db.execute("INSERT INTO dirs (parent, name, depth) VALUES (NULL, '', 0)").lastrowid
+            row = (root_id, None, 0)
+
+        pending = deque([(row[0], root, 0, row[1], row[2])])   # (id, path, depth, cached mtime, cached gen)
+        running = {}
+        last_commit = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='du') as pool:
+            while pending or running:
+                if cancel.is_set():
+                    for future in running:
+                        future.cancel()
+                    db.commit()
+                    return False
+
+                # Keep the pool busy without queueing the whole tree at once
+                while pending and len(running) < self.workers * 4:
+                    node_id, path, depth, cached_mtime, cached_gen = pending.popleft()
+                    if resume and cached_gen == generation:
+                        # Finished before the interruption - just descend
+                        self._descend(db, node_id, path, depth, pending)
+                        status['dirs_reused'] += 1
+                        continue
+                    reuse_mtime = None if full else cached_mtime
+                    future = pool.submit(self._list_dir, path, root_dev, reuse_mtime)
+                    running[future] = (node_id, path, depth)
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node_id, path, depth = running.pop(future)
+                    self._store(db, future.result(), node_id, path, depth, generation, status, pending)
+
+                if time.monotonic() - last_commit >= self.commit_interval:
+                    db.commit()
+                    last_commit = time.monotonic()
+
+        db.commit()
+        return True
+
+    def _list_dir(self, path, root_dev, reuse_mtime):
+        """Worker: return (mtime_ns, own_size, own_files, subdir names or None if unchanged,
+        hard-linked (inode, size) pairs, error, mounted)"""
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            return None, 0, 0, [], [], str(e), False
+        if st.st_dev != root_dev:
+            return None, 0, 0, [], [], None, True     # another filesystem: stay out
+        mtime_ns = st.st_mtime_ns
+        if reuse_mtime is not None and mtime_ns == reuse_mtime:
+            return mtime_ns, 0, 0, None, [], None, False
+
+        size = 0
+        files = 0
+        subdirs = []
+        linked = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(st.st_mode):
+                        # Mountpoints are recognised when the subdirectory itself is listed,
+                        # so a drive mounted under an unchanged directory is still caught
+                        subdirs.append(entry.name)
+                    else:
+                        # Allocated size, like du (sparse files count what they use)
+                        files += 1
+                        if st.st_nlink > 1:
+                            linked.append((st.st_ino, st.st_blocks * 512))
+                        else:
+                            size += st.st_blocks * 512
+        except OSError as e:
+            return mtime_ns, size, files, subdirs, linked, str(e), False
+        return mtime_ns, size, files, subdirs, linked, None, False
+
+    def _store(self, db, result, node_id, path, depth, generation, status, pending):
+        mtime_ns, size, files, subdirs, linked, error, mounted = result
+        if error:
+            status['errors'] += 1
+
+        if mounted:
+            # Not counted; no mtime, so it is checked again on the next scan
+            db.execute('UPDATE dirs SET mount = 1, mtime_ns = NULL, own_size = 0, own_files = 0, gen = ? '
+                       'WHERE id = ?', (generation, node_id))
+            db.execute('DELETE FROM links WHERE dir = ?', (node_id,))
+            status['mounts_skipped'] += 1
+            return
+
+        if subdirs is None:
+            # Unchanged since the last scan: keep its file totals and children
+            db.execute('UPDATE dirs SET gen = ? WHERE id = ?', (generation, node_id))
+            self._descend(db, node_id, path, depth, pending)
+            status['dirs_reused'] += 1
+            return
+
+        # Hard links are counted once across the tree in _compute_totals
+        db.execute('DELETE FROM links WHERE dir = ?', (node_id,))
+        db.executemany('INSERT OR REPLACE INTO links VALUES (?, ?, ?)',
+                       [(node_id, inode, linked_size) for inode, linked_size in linked])
+        db.execute('UPDATE dirs SET mtime_ns = ?, own_size = ?, own_files = ?, mount = 0, gen = ? WHERE id = ?',
+                   (mtime_ns, size, files, generation, node_id))
+        status['dirs_scanned'] += 1
+        status['files_scanned'] += files
+
+        known = {name: (child_id, mtime, gen) for child_id, name, mtime, gen in
+                 db.execute('SELECT id, name, mtime_ns, gen FROM dirs WHERE parent = ?', (node_id,))}
+        for name in subdirs:
+            child = known.get(name)
+            if child is None:
+                child_id = db.execute('INSERT INTO dirs (parent, name, depth) VALUES (?, ?, ?)',
+                                      (node_id, name, depth + 1)).lastrowid
+                child = (child_id, None, 0)
+            pending.append((child[0], os.path.join(path, name), depth + 1, child[1], child[2]))
+        # Children that disappeared keep their old generation and are deleted at the end
+
+    def _descend(self, db, node_id, path, depth, pending):
+        for child_id, name, mtime, gen in db.execute(
+                'SELECT id, name, mtime_ns, gen FROM dirs WHERE parent = ?', (node_id,)):
+            pending.append((child_id, os.path.join(path, name), depth + 1, mtime, gen))
+
+    def _compute_totals(self, db):
+        """Roll own sizes up into subtree totals, deepest level first"""
+        # Like du, a hard-linked file counts once: in the lowest-id directory holding it
+        owned = db.execute('SELECT dir, SUM(size) FROM (SELECT MIN(dir) AS dir, MAX(size) AS size '
+                           'FROM links GROUP BY inode) GROUP BY dir').fetchall()
+        db.execute('UPDATE dirs SET linked_size = 0 WHERE linked_size != 0')
+        db.executemany('UPDATE dirs SET linked_size = ? WHERE id = ?', [(size, dir_id) for dir_id, size in owned])
+
+        max_depth = db.execute('SELECT MAX(depth) FROM dirs').fetchone()[0] or 0
+        for depth in range(max_depth, -1, -1):
+            db.execute("""
+                UPDATE dirs SET
+                    size = own_size + linked_size + COALESCE((SELECT SUM(c.size) FROM dirs c WHERE c.parent = dirs.id), 0),
+                    files = own_files + COALESCE((SELECT SUM(c.files) FROM dirs c WHERE c.parent = dirs.id), 0)
+                WHERE depth = ?
+            """, (depth,))
+
+    # ---------- queries ----------
+
+    def get_usage(self, path, limit=50, offset=0):
+        """Return path's totals and one page of its subdirectories, largest first"""
+        target = self._resolve(path)
+        limit = max(1, min(int(limit), 500))
+        offset = max(0, int(offset))
+
+        root = next((r for r in self._roots() if target == r or target.startswith(r + os.sep)), None)
+        status = self.get_status(root) if root else None
+        if root is None or not os.path.exists(self._db_path(root)):
+            return {'path': target, 'scanned': False, 'scan': status}
+
+        db = sqlite3.connect(self._db_path(root), timeout=10)
+        try:
+            meta = dict(db.execute('SELECT key, value FROM meta'))
+            node = db.execute('SELECT id, own_size + linked_size, own_files, size, files FROM dirs '
+                              'WHERE parent IS NULL').fetchone()
+            relative = os.path.relpath(target, root)
+            if node and relative != '.':
+                for name in relative.split(os.sep):
+                    node = db.execute('SELECT id, own_size + linked_size, own_files, size, files FROM dirs '
+                                      'WHERE parent = ? AND name = ?', (node[0], name)).fetchone()
+                    if node is None:
+                        break
+            if node is None:
+                return {'path': target, 'root': root, 'scanned': False, 'scan': status}
+
+            node_id, own_size, own_files, size, files = node
+            total_children = db.execute('SELECT COUNT(*) FROM dirs WHERE parent = ?', (node_id,)).fetchone()[0]
+            children = [
+                {'name': name, 'path': os.path.join(target, name), 'size': child_size,
+                 'size_human': self._format_size(child_size), 'files': child_files, 'mount': bool(mount)}
+                for name, child_size, child_files, mount in db.execute(
+                    'SELECT name, size, files, mount FROM dirs WHERE parent = ? ORDER BY size DESC LIMIT ? OFFSET ?',
+                    (node_id, limit, offset))
+            ]
+            # Drives mounted below target are not part of its size
+            skipped_mounts = sorted(
+                mount_path for mount_path in
+                (self._node_path(db, root, mount_id) for mount_id, in
+                 db.execute('SELECT id FROM dirs WHERE mount = 1').fetchall())
+                if mount_path.startswith(target + os.sep))
+        finally:
+            db.close()
+
+        return {
+            'path': target,
+            'root': root,
+            'scanned': True,
+            'complete': meta.get('state') == 'complete',
+            'finished_at': meta.get('finished_at'),
+            'size': size,
+            'size_human': self._format_size(size),
+            'files': files,
+            'own_size': own_size,
+            'own_files': own_files,
+            'children': children,
+            'total_children': total_children,
+            'skipped_mounts': skipped_mounts,
+            'limit': limit,
+            'offset': offset,
+            'scan': status
+        }
+
+    def _node_path(self, db, root, node_id):
+        names = []
+        while True:
+            parent, name = db.execute('SELECT parent, name FROM dirs WHERE id = ?', (node_id,)).fetchone()
+            if parent is None:
+                return os.path.join(root, *reversed(names))
+            names.append(name)
+            node_id = parent
+
+    def _format_size(self, size):
+        return self.storage_mgr._format_size(size)
+
+
+# Standalone test
+if __name__ == '__main__':
+    import sys
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from modules.storage import StorageManager
+
+    target = sys.argv[1] if len(sys.argv) > 1 else '/usr'
+    storage = StorageManager()
+    storage.mount_base = target
+
+    analyzer = DiskUsageAnalyzer(storage)
+    analyzer.cache_dir = tempfile.mkdtemp()
+
+    for label in ('first scan', 'rescan'):
+        print(f"Testing DiskUsageAnalyzer on {target} ({label})...")
+        analyzer.start_scan(target)
+        while analyzer.get_status(target)['state'] == 'running':
+            time.sleep(0.2)
+        status = analyzer.get_status(target)
+        print(f"  {status['state']} in {status['finished_at'] - status['started_at']:.2f}s: "
+              f"{status['dirs_scanned']} listed, {status['dirs_reused']} reused, {status['errors']} errors")
+
+    usage = analyzer.get_usage(target, limit=5)
+    print(f"  {usage['size_human']} in {usage['files']} files")
+    for child in usage['children']:
+        print(f"    {child['size_human']:>8}  {child['name']}")
@@ -0,0 +1,316 @@
+import errno
+import mimetypes
+import os
+import pwd
+import select
+import socket
+import ssl
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+
+class FileBrowser:
+    """Directory listings and ranged file reads under the managed mount bases.
+
+    Downloads are served from an open file positioned at the start of the
+    requested range. Under the Werkzeug development server (python3 app.py)
+    the range is written to the client socket with sendfile() once the
+    headers are out; under gunicorn the file goes to its wsgi.file_wrapper,
+    which sends Content-Length bytes with sendfile(). Anything else (TLS,
+    other servers) streams the range in fixed-size pread() chunks. Either way
+    a file is never read into memory whole.
+
+    Non-admins only see what their system account could read itself: the path
+    is opened one component at a time from its mount base (dir_fd, O_NOFOLLOW)
+    and each opened directory and the final file or directory are checked
+    against the user's uid/groups with fstat. Nothing is followed after the
+    path was resolved, so a component swapped for a symlink fails instead.
+    (POSIX ACLs are not consulted.)
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    MAX_LIMIT = 1000
+    # Media a browser can show inline without running anything; everything else
+    # (html, svg, pdf, ...) is sent as an opaque attachment
+    INLINE_TYPES = frozenset({
+        'image/png', 'image/jpeg', 'image/gif', 'image/webp',
+        'video/mp4', 'video/webm', 'audio/mpeg', 'audio/ogg', 'audio/mp4'
+    })
+
+    def __init__(self, storage_mgr):
+        self.storage_mgr = storage_mgr
+
+    def is_private(self, real_path):
+        base = os.path.realpath(self.storage_mgr.mount_base_private)
+        return real_path == base or real_path.startswith(base + os.sep)
+
+    def resolve(self, path, is_admin=False):
+        real = self.storage_mgr.resolve_managed_path(path)
+        if not is_admin and self.is_private(real):
+            raise PermissionError('Private drives are admin only')
+        return real
+
+    def _credentials(self, username):
+        """(uid, gids) of a login; an account without a system user only gets 'other' access"""
+        try:
+            pw = pwd.getpwnam(username or '')
+        except KeyError:
+            return None, set()
+        return pw.pw_uid, set(os.getgrouplist(pw.pw_name, pw.pw_gid))
+
+    def _check_access(self, st, credentials, mode):
+        """Permission bits check (like access(2) for that user); mode is os.R_OK/os.X_OK bits"""
+        uid, gids = credentials
+        if uid == 0:
+            return
+        if st.st_uid == uid:
+            allowed = (st.st_mode >> 6) & 7
+        elif st.st_gid in gids:
+            allowed = (st.st_mode >> 3) & 7
+        else:
+            allowed = st.st_mode & 7
+        if allowed & mode != mode:
+            raise PermissionError('Permission denied')
+
+    def _base_of(self, real):
+        bases = [os.path.realpath(base) for base in self.storage_mgr.managed_bases()]
+        return max((base for base in bases if real == base or real.startswith(base + os.sep)), key=len)
+
+    def _open(self, real, directory, credentials):
+        """fd for a resolved path, opened component by component below its mount base.
+        credentials None (admin) skips the permission checks."""
+        base = self._base_of(real)
+        fd = os.open(base, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        try:
+            relative = os.path.relpath(real, base)
+            names = relative.split(os.sep) if relative != '.' else []
+            for i, name in enumerate(names):
+                if credentials:
+                    self._check_access(os.fstat(fd), credentials, os.X_OK)
+                flags = os.O_RDONLY | os.O_NOFOLLOW | os.O_CLOEXEC
+                if i < len(names) - 1 or directory:
+                    flags |= os.O_DIRECTORY
+                else:
+                    flags |= os.O_NONBLOCK      # a FIFO must not block the request
+                try:
+                    child = os.open(name, flags, dir_fd=fd)
+                except OSError as e:
+                    if e.errno == errno.ELOOP:
+                        raise PermissionError('Symbolic links are not followed') from None
+                    raise
+                os.close(fd)
+                fd = child
+            if credentials:
+                self._check_access(os.fstat(fd), credentials, os.R_OK | (os.X_OK if directory else 0))
+            return fd
+        except Exception:
+            os.close(fd)
+            raise
+
+    def list_bases(self, is_admin=False):
+        entries = []
+        for base in self.storage_mgr.managed_bases():
+            real = os.path.realpath(base)
+            if os.path.isdir(real) and (is_admin or not self.is_private(real)):
+                entries.append({'name': base, 'path': real, 'is_dir': True})
+        return {'path': None, 'parent': None, 'entries': entries, 'total': len(entries),
+                'limit': len(entries), 'offset': 0}
+
+    def list_dir(self, path, limit=200, offset=0, is_admin=False, username=None):
+        """One page of a directory: subdirectories first, then files, by name"""
+        real = self.resolve(path, is_admin)
+        limit = max(1, min(int(limit), self.MAX_LIMIT))
+        offset = max(0, int(offset))
+
+        entries = []
+        fd = self._open(real, True, None if is_admin else self._credentials(username))
+        try:
+            with os.scandir(fd) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    entries.append((not stat.S_ISDIR(st.st_mode), entry.name.lower(), entry.name, st))
+        finally:
+            os.close(fd)
+        entries.sort(key=lambda e: (e[0], e[1]))
+
+        page = []
+        for is_file, _, name, st in entries[offset:offset + limit]:
+            page.append({
+                'name': name,
+                'path': os.path.join(real, name),
+                'is_dir': not is_file,
+                'is_link': stat.S_ISLNK(st.st_mode),
+                'size': st.st_size if is_file else None,
+                'size_human': self.storage_mgr._format_size(st.st_size) if is_file else None,
+                'modified': st.st_mtime
+            })
+
+        try:
+            parent = self.resolve(os.path.dirname(real), is_admin) if os.path.dirname(real) != real else None
+        except (ValueError, PermissionError):
+            parent = None   # top of a mount base
+
+        return {
+            'path': real,
+            'parent': parent,
+            'entries': page,
+            'total': len(entries),
+            'limit': limit,
+            'offset': offset
+        }
+
+    def open_file(self, path, range_header=None, if_range=None, is_admin=False, username=None):
+        """Open path for a (possibly ranged) download.
+
+        Returns (file, info) where file is positioned at info['start'] and
+        info holds status (200/206/416), start, length, size and headers.
+        """
+        real = self.resolve(path, is_admin)
+        f = os.fdopen(self._open(real, False, None if is_admin else self._credentials(username)), 'rb')
+        try:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                raise ValueError('Not a regular file')
+
+            size = st.st_size
+            etag = f'"{st.st_mtime_ns:x}-{size:x}"'
+            content_type = mimetypes.guess_type(real)[0]
+            headers = {
+                'Accept-Ranges': 'bytes',
+                'ETag': etag,
+                'Last-Modified': formatdate(st.st_mtime, usegmt=True),
+                'Content-Type': content_type if content_type in self.INLINE_TYPES else 'application/octet-stream',
+                # Files on shared drives are untrusted: never sniffed, never scripted
+                'X-Content-Type-Options': 'nosniff',
+                'Content-Security-Policy': 'sandbox'
+            }
+
+            status, start, length = 200, 0, size
+            if range_header and self._if_range_matches(if_range, etag, st.st_mtime):
+                parsed = self._parse_range(range_header, size)
+                if parsed == 'unsatisfiable':
+                    headers['Content-Range'] = f'bytes */{size}'
+                    f.close()
+                    return None, {'status': 416, 'start': 0, 'length': 0, 'size': size, 'headers': headers,
+                                  'path': real}
+                if parsed:
+                    start, end = parsed
+                    status, length = 206, end - start + 1
+                    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+            headers['Content-Length'] = str(length)
+            f.seek(start)
+            return f, {'status': status, 'start': start, 'length': length, 'size': size,
+                       'headers': headers, 'path': real}
+        except Exception:
+            f.close()
+            raise
+
+    def _if_range_matches(self, if_range, etag, mtime):
+        """A stale If-Range means the client's partial copy is outdated: send everything"""
+        if not if_range:
+            return True
+        if if_range.startswith(('"', 'W/')):
+            return if_range == etag
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def _parse_range(self, header, size):
+        """Parse a single 'bytes=' range; None means ignore it and send the whole file"""
+        unit, _, spec = header.partition('=')
+        if unit.strip().lower() != 'bytes' or ',' in spec:
+            return None     # other units or multipart ranges: a full 200 is allowed
+        first, sep, last = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            else:
+                suffix = int(last)
+                if suffix == 0:
+                    return 'unsatisfiable'
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            return 'unsatisfiable'
+        if start < 0 or end < start:
+            return None
+        return start, min(end, size - 1)
+
+    def can_sendfile(self, sock):
+        """Whether a range can be written straight to this client socket"""
+        return isinstance(sock, socket.socket) and not isinstance(sock, ssl.SSLSocket)
+
+    def sendfile_range(self, f, sock, start, length):
+        """Send length bytes from start to sock with sendfile(), then close the file.
+
+        Yields one empty chunk first so the server writes and flushes the
+        headers; the body then bypasses the response iterator entirely.
+        """
+        try:
+            yield b''
+            fd = f.fileno()
+            offset = start
+            remaining = length
+            while remaining > 0:
+                try:
+                    sent = os.sendfile(sock.fileno(), fd, offset, min(self.CHUNK_SIZE, remaining))
+                except BlockingIOError:
+                    select.select([], [sock], [])   # socket has a timeout set
+                    continue
+                if not sent:
+                    break   # file shrank while we were sending it
+                offset += sent
+                remaining -= sent
+        finally:
+            f.close()
+
+    def iter_range(self, f, start, length):
+        """Yield length bytes from start in CHUNK_SIZE pieces, then close the file"""
+        try:
+            fd = f.fileno()
+            offset = start
+            remaining = length
+            while remaining > 0:
+                chunk = os.pread(fd, min(self.CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break   # file shrank while we were sending it
+                offset += len(chunk)
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+
+# Standalone test
+if __name__ == '__main__':
+    import sys
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from modules.storage import StorageManager
+
+    print("Testing FileBrowser...")
+    base = tempfile.mkdtemp()
+    with open(os.path.join(base, 'data.bin'), 'wb') as out:
+        out.write(bytes(range(256)) * 4096)
+    os.mkdir(os.path.join(base, 'folder'))
+
+    storage = StorageManager()
+    storage.mount_base = base
+    browser = FileBrowser(storage)
+
+    listing = browser.list_dir(base, is_admin=True)
+    print(f"  {listing['total']} entries: {[e['name'] for e in listing['entries']]}")
+
+    for header in (None, 'bytes=0-99', 'bytes=-10', 'bytes=1048570-', 'bytes=9999999-'):
+        f, info = browser.open_file(os.path.join(base, 'data.bin'), header, is_admin=True)
+        sent = b''.join(browser.iter_range(f, info['start'], info['length'])) if f else b''
+        print(f"  Range {header}: {info['status']} {info['headers'].get('Content-Range', '')} "
+              f"({len(sent)} bytes)")
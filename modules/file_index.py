@@ -0,0 +1,348 @@
+import configparser
+import fcntl
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER,
+    gen INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    dir INTEGER NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    is_dir INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_dir ON entries(dir);
+CREATE UNIQUE INDEX IF NOT EXISTS entries_dir_name ON entries(dir, name COLLATE BINARY);
+CREATE INDEX IF NOT EXISTS entries_name ON entries(name);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+# Indexes created before entries_dir_name could hold duplicate rows from overlapping crawls
+DEDUPE = """
+DELETE FROM entries WHERE id NOT IN (SELECT MIN(id) FROM entries GROUP BY dir, name COLLATE BINARY)
+"""
+
+# Trigram full-text index over entries.name for substring queries (SQLite 3.34+)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    name, content='entries', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+
+class FileIndex:
+    """Filename index for the drives mounted under the managed mount bases.
+
+    One SQLite file per mountpoint holds every directory (with its mtime) and
+    every entry name. A background crawler keeps it current: a directory whose
+    mtime is unchanged keeps its stored entries without being listed again, so
+    a refresh of an idle drive costs one stat per directory.
+
+    Prefix queries use the name index; substring queries use an FTS5 trigram
+    table when SQLite supports it, otherwise a LIKE scan.
+    """
+
+    def __init__(self, storage_mgr, config_file=None):
+        self.storage_mgr = storage_mgr
+        self.enabled = False
+        self.cache_dir = 'cache/search'
+        self.interval = 900
+        self.commit_interval = 2.0
+        self._load_config(config_file)
+
+        self._status = {}               # mountpoint -> crawl status
+        self._lock = threading.Lock()
+        self._thread = None
+        self._fts = None
+
+    def _load_config(self, config_file):
+        if not config_file:
+            return
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        self.enabled = config.getboolean('search', 'enabled', fallback=self.enabled)
+        self.cache_dir = config.get('search', 'cache_dir', fallback=self.cache_dir)
+        self.interval = config.getint('search', 'interval', fallback=self.interval)
+
+    def start(self, watcher=None):
+        """Start the crawler; with a StorageWatcher, new mounts are indexed right away"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            events = watcher.subscribe() if watcher else None
+            self._thread = threading.Thread(target=self._crawl_loop, args=(events,),
+                                            name='file-index', daemon=True)
+            self._thread.start()
+
+    def _db_path(self, mountpoint):
+        digest = hashlib.sha1(mountpoint.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{digest}.db')
+
+    def _connect(self, mountpoint):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        db = sqlite3.connect(self._db_path(mountpoint), timeout=10)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        if not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'entries_dir_name'").fetchone():
+            if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'entries'").fetchone():
+                with db:
+                    db.execute(DEDUPE)
+        db.executescript(SCHEMA)
+        if self._fts is None:
+            try:
+                db.executescript(FTS_SCHEMA)
+                self._fts = True
+            except sqlite3.OperationalError:
+                self._fts = False   # no fts5/trigram in this SQLite build
+        elif self._fts:
+            db.executescript(FTS_SCHEMA)
+        return db
+
+    # ---------- crawling ----------
+
+    def _crawl_loop(self, events):
+        while True:
+            for mountpoint in self.storage_mgr.managed_mounts():
+                try:
+                    self.crawl(mountpoint)
+                except Exception as e:
+                    print(f"Warning: indexing {mountpoint} failed: {e}")
+
+            # Sleep until the next refresh, or until something is mounted
+            deadline = time.monotonic() + self.interval
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if events is None:
+                    time.sleep(remaining)
+                    break
+                try:
+                    event = events.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event.get('type') == 'mounts-changed':
+                    new = [m for m in self.storage_mgr.managed_mounts() if m not in self._status]
+                    if new:
+                        break
+
+    def crawl(self, mountpoint, full=False):
+        """Bring the index for one mountpoint up to date.
+
+        Crawls of the same mountpoint are serialized with a lock file next to
+        its database, so overlapping crawlers (another thread or worker
+        process) skip it instead of walking it twice. Returns False if skipped.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        lock = open(self._db_path(mountpoint) + '.lock', 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        try:
+            self._crawl(mountpoint, full)
+        finally:
+            lock.close()    # releases the flock
+        return True
+
+    def _crawl(self, mountpoint, full):
+        status = {'state': 'crawling', 'started_at': time.time(), 'finished_at': None,
+                  'dirs_listed': 0, 'dirs_unchanged': 0, 'entries': None}
+        with self._lock:
+            previous = self._status.get(mountpoint, {})
+            status['entries'] = previous.get('entries')
+            self._status[mountpoint] = status
+
+        db = self._connect(mountpoint)
+        try:
+            generation = int(dict(db.execute('SELECT key, value FROM meta')).get('generation', 0)) + 1
+            self._walk(db, mountpoint, generation, status, full)
+
+            with db:
+                # Directories not reached this time were deleted, moved or are unreadable
+                stale = '(SELECT id FROM dirs WHERE gen != ?)'
+                db.execute(f'DELETE FROM entries WHERE dir IN {stale}', (generation,))
+                db.execute('DELETE FROM dirs WHERE gen != ?', (generation,))
+                db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+                    ('mountpoint', mountpoint), ('generation', generation), ('indexed_at', time.time())
+                ])
+            status['entries'] = db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            status['state'] = 'ready'
+        except Exception:
+            status['state'] = 'failed'
+            raise
+        finally:
+            status['finished_at'] = time.time()
+            db.close()
+
+    def _walk(self, db, mountpoint, generation, status, full):
+        root_dev = os.stat(mountpoint).st_dev
+        pending = ['']
+        last_commit = time.monotonic()
+
+        while pending:
+            relative = pending.pop()
+            path = os.path.join(mountpoint, relative) if relative else mountpoint
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_dev != root_dev:
+                continue    # another filesystem mounted inside this one
+
+            row = db.execute('SELECT id, mtime_ns FROM dirs WHERE path = ?', (relative,)).fetchone()
+            if row and row[1] == st.st_mtime_ns and not full:
+                dir_id = row[0]
+                db.execute('UPDATE dirs SET gen = ? WHERE id = ?', (generation, dir_id))
+                subdirs = [name for (name,) in db.execute(
+                    'SELECT name FROM entries WHERE dir = ? AND is_dir = 1', (dir_id,))]
+                status['dirs_unchanged'] += 1
+            else:
+                subdirs = self._index_dir(db, path, relative, row, st.st_mtime_ns, generation)
+                status['dirs_listed'] += 1
+
+            pending.extend(os.path.join(relative, name) if relative else name for name in subdirs)
+
+            if time.monotonic() - last_commit >= self.commit_interval:
+                db.commit()
+                last_commit = time.monotonic()
+
+        db.commit()
+
+    def _index_dir(self, db, path, relative, row, mtime_ns, generation):
+        """List one directory, sync its entries, and return its subdirectory names"""
+        current = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        current[entry.name] = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        current[entry.name] = False
+        except OSError:
+            pass    # unreadable: index it as empty
+
+        if row:
+            dir_id = row[0]
+            db.execute('UPDATE dirs SET mtime_ns = ?, gen = ? WHERE id = ?', (mtime_ns, generation, dir_id))
+        else:
+            db.execute('INSERT INTO dirs (path, mtime_ns, gen) VALUES (?, ?, ?) ON CONFLICT(path) '
+                       'DO UPDATE SET mtime_ns = excluded.mtime_ns, gen = excluded.gen',
+                       (relative, mtime_ns, generation))
+            dir_id = db.execute('SELECT id FROM dirs WHERE path = ?', (relative,)).fetchone()[0]
+
+        stored = {name: (entry_id, bool(is_dir)) for entry_id, name, is_dir in
+                  db.execute('SELECT id, name, is_dir FROM entries WHERE dir = ?', (dir_id,))}
+        removed = [entry_id for name, (entry_id, is_dir) in stored.items() if current.get(name) != is_dir]
+        added = [(dir_id, name, is_dir) for name, is_dir in current.items()
+                 if name not in stored or stored[name][1] != is_dir]
+        if removed:
+            db.executemany('DELETE FROM entries WHERE id = ?', [(entry_id,) for entry_id in removed])
+        if added:
+            db.executemany('INSERT OR IGNORE INTO entries (dir, name, is_dir) VALUES (?, ?, ?)', added)
+
+        return [name for name, is_dir in current.items() if is_dir]
+
+    # ---------- queries ----------
+
+    def search(self, q, mode='substring', limit=50):
+        """Find entries whose name starts with (prefix) or contains (substring) q"""
+        q = (q or '').strip()
+        if not q:
+            raise ValueError('Query required')
+        if mode not in ('prefix', 'substring'):
+            raise ValueError('mode must be prefix or substring')
+        if not self.enabled:
+            raise ValueError('Search index is disabled (see [search] in settings.ini)')
+        limit = max(1, min(int(limit), 500))
+
+        started = time.perf_counter()
+        results = []
+        for mountpoint in self.storage_mgr.managed_mounts():
+            if len(results) >= limit:
+                break
+            if not os.path.exists(self._db_path(mountpoint)):
+                continue
+            db = sqlite3.connect(self._db_path(mountpoint), timeout=10)
+            try:
+                for path, name, is_dir in self._query(db, q, mode, limit - len(results)):
+                    results.append({
+                        'name': name,
+                        'path': os.path.join(mountpoint, path, name),
+                        'is_dir': bool(is_dir),
+                        'mountpoint': mountpoint
+                    })
+            finally:
+                db.close()
+
+        return {
+            'query': q,
+            'mode': mode,
+            'results': results,
+            'took_ms': round((time.perf_counter() - started) * 1000, 1),
+            'indexes': self.get_status()
+        }
+
+    def _query(self, db, q, mode, limit):
+        escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        select = 'SELECT d.path, e.name, e.is_dir FROM entries e JOIN dirs d ON d.id = e.dir'
+        if mode == 'prefix':
+            return db.execute(f"{select} WHERE e.name LIKE ? ESCAPE '\\' LIMIT ?", (escaped + '%', limit))
+        if self._fts and len(q) >= 3:
+            # Trigram phrase query: any name containing q, case-insensitive
+            phrase = '"' + q.replace('"', '""') + '"'
+            return db.execute(f'{select} WHERE e.id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?) '
+                              'LIMIT ?', (phrase, limit))
+        return db.execute(f"{select} WHERE e.name LIKE ? ESCAPE '\\' LIMIT ?", ('%' + escaped + '%', limit))
+
+    def get_status(self):
+        with self._lock:
+            return {mountpoint: dict(status) for mountpoint, status in self._status.items()}
+
+
+# Standalone test
+if __name__ == '__main__':
+    import sys
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from modules.storage import StorageManager
+
+    target = sys.argv[1] if len(sys.argv) > 1 else '/usr'
+    query = sys.argv[2] if len(sys.argv) > 2 else 'python'
+    storage = StorageManager()
+    storage.managed_mounts = lambda: [target]
+
+    index = FileIndex(storage)
+    index.enabled = True
+    index.cache_dir = tempfile.mkdtemp()
+
+    print(f"Testing FileIndex on {target}...")
+    for label in ('initial crawl', 'refresh'):
+        started = time.perf_counter()
+        index.crawl(target)
+        status = index.get_status()[target]
+        print(f"  {label}: {time.perf_counter() - started:.2f}s, {status['dirs_listed']} listed, "
+              f"{status['dirs_unchanged']} unchanged, {status['entries']} entries")
+
+    for mode in ('prefix', 'substring'):
+        found = index.search(query, mode=mode, limit=5)
+        print(f"  {mode} '{query}': {len(found['results'])} results in {found['took_ms']}ms")
+        for result in found['results']:
+            print(f"    {result['path']}")
@@ -0,0 +1,145 @@
+import math
+import threading
+import time
+from array import array
+
+class MetricsHistory:
+    # (step seconds, number of points) - 10 minutes, 6 hours and 7 days
+    DEFAULT_TIERS = [(1, 600), (10, 2160), (60, 10080)]
+
+    METRICS = ['cpu', 'memory', 'temperature', 'disk_read', 'disk_write', 'net_rx', 'net_tx']
+
+    def __init__(self, tiers=None, metrics=None):
+        self.metrics = list(metrics or self.METRICS)
+        self._lock = threading.Lock()
+        self._tiers = []
+
+        for step, size in (tiers or self.DEFAULT_TIERS):
+            # Fixed-size ring buffers, allocated once: memory never grows
+            self._tiers.append({
+                'step': step,
+                'size': size,
+                'head': 0,            # next slot to write
+                'count': 0,           # number of valid slots
+                'times': array('d', bytes(8 * size)),
+                'values': {m: array('f', bytes(4 * size)) for m in self.metrics},
+                # Running sums for the bucket currently being filled
+                'bucket': None,
+                'sums': {m: 0.0 for m in self.metrics},
+                'counts': {m: 0 for m in self.metrics}
+            })
+
+    def memory_bytes(self):
+        total = 0
+        for tier in self._tiers:
+            total += tier['times'].itemsize * tier['size']
+            total += sum(v.itemsize * tier['size'] for v in tier['values'].values())
+        return total
+
+    def record(self, timestamp, values):
+        """Add one sample; each tier rolls it up into its own bucket"""
+        with self._lock:
+            for tier in self._tiers:
+                bucket = int(timestamp // tier['step']) * tier['step']
+
+                if tier['bucket'] is not None and bucket != tier['bucket']:
+                    self._flush_bucket(tier)
+                tier['bucket'] = bucket
+
+                for metric in self.metrics:
+                    value = values.get(metric)
+                    if value is not None:
+                        tier['sums'][metric] += value
+                        tier['counts'][metric] += 1
+
+    def _flush_bucket(self, tier):
+        head = tier['head']
+        tier['times'][head] = tier['bucket']
+
+        for metric in self.metrics:
+            count = tier['counts'][metric]
+            # NaN marks a gap (e.g. no temperature sensor)
+            tier['values'][metric][head] = tier['sums'][metric] / count if count else float('nan')
+            tier['sums'][metric] = 0.0
+            tier['counts'][metric] = 0
+
+        tier['head'] = (head + 1) % tier['size']
+        tier['count'] = min(tier['count'] + 1, tier['size'])
+
+    def _pick_tier(self, range_seconds, step):
+        # Finest tier that satisfies the requested step and covers the range
+        for tier in self._tiers:
+            if tier['step'] >= step and tier['step'] * tier['size'] >= range_seconds:
+                return tier
+        return self._tiers[-1]
+
+    def query(self, metric, range_seconds=600, step=1):
+        if metric not in self.metrics:
+            raise ValueError(f'Unknown metric: {metric}. Valid: {", ".join(self.metrics)}')
+
+        with self._lock:
+            tier = self._pick_tier(range_seconds, step)
+            size = tier['size']
+            count = min(tier['count'], int(range_seconds // tier['step']) or 1)
+
+            start = (tier['head'] - count) % size
+            if start + count <= size:
+                times = tier['times'][start:start + count]
+                values = tier['values'][metric][start:start + count]
+            else:
+                times = tier['times'][start:] + tier['times'][:(start + count) % size]
+                values = tier['values'][metric][start:] + tier['values'][metric][:(start + count) % size]
+
+            # The bucket still being filled, as its running average so far
+            current = None
+            if tier['bucket'] is not None and tier['counts'][metric]:
+                current = (tier['bucket'], tier['sums'][metric] / tier['counts'][metric])
+
+        cutoff = time.time() - range_seconds
+        points = []
+        for ts, value in zip(times, values):
+            if ts < cutoff:
+                continue
+            points.append([ts, None if value != value else round(value, 2)])
+        if current:
+            points.append([current[0], round(current[1], 2)])
+
+        return {
+            'metric': metric,
+            'step': tier['step'],
+            'range': range_seconds,
+            'points': points,
+            'partial': current is not None   # the last point's bucket is still open
+        }
+
+    @staticmethod
+    def parse_duration(value, default):
+        """Parse '90', '10m', '6h' or '7d' into seconds"""
+        if not value:
+            return default
+
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+        value = value.strip().lower()
+        multiplier = units.get(value[-1:], 1)
+        number = float(value[:-1] if value[-1:] in units else value)
+        seconds = int(number * multiplier) if math.isfinite(number) else 0
+        if seconds <= 0:
+            raise ValueError(f'Invalid duration: {value}')
+        return seconds
+
+
+# Standalone test
+if __name__ == '__main__':
+    print("Testing MetricsHistory...")
+    history = MetricsHistory()
+    print(f"Buffer memory: {history.memory_bytes() / 1024:.0f} KB")
+
+    now = time.time()
+    for i in range(120):
+        history.record(now - 120 + i, {'cpu': i % 100, 'memory': 50.0})
+
+    data = history.query('cpu', range_seconds=120, step=1)
+    print(f"1s tier: {len(data['points'])} points, last {data['points'][-1]}")
+
+    data = history.query('cpu', range_seconds=3600, step=10)
+    print(f"10s tier: {len(data['points'])} points (step {data['step']}s)")
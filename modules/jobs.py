@@ -0,0 +1,156 @@
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+class JobManager:
+    """Runs slow operations off the request thread.
+
+    Jobs sharing a key (e.g. the same device) run one at a time in
+    submission order; different keys run in parallel on a small pool.
+    """
+
+    def __init__(self, max_workers=2, keep_finished=100):
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()      # id -> job dict, oldest first
+        self._queues = {}               # key -> deque of job ids waiting behind the running one
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def submit(self, job_type, key, func, *args, username=None, **kwargs):
+        """Queue func(*args, progress=callback, **kwargs); returns the job id"""
+        job_id = secrets.token_hex(8)
+        job = {
+            'id': job_id,
+            'type': job_type,
+            'key': key,
+            'username': username,
+            'status': 'queued',
+            'progress': [],
+            'result': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            '_call': (func, args, kwargs)
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            waiting = self._queues.get(key)
+            if waiting is None:
+                # Nothing running for this key - start now
+                self._queues[key] = deque()
+                self._executor.submit(self._run, job_id)
+            else:
+                waiting.append(job_id)
+            self._prune()
+
+        self._publish(job)
+        return job_id
+
+    def _run(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+        self._publish(job)
+
+        func, args, kwargs = job['_call']
+
+        def progress(message):
+            with self._lock:
+                job['progress'].append({'time': time.time(), 'message': message})
+            self._publish(job)
+
+        try:
+            result = func(*args, progress=progress, **kwargs)
+            status = 'succeeded' if not isinstance(result, dict) or result.get('success', True) else 'failed'
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+            status = 'failed'
+
+        with self._lock:
+            job['result'] = result
+            job['status'] = status
+            job['finished_at'] = time.time()
+            del job['_call']
+
+            # Start the next job for this key, if any
+            waiting = self._queues[job['key']]
+            if waiting:
+                self._executor.submit(self._run, waiting.popleft())
+            else:
+                del self._queues[job['key']]
+
+        self._publish(job)
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j['finished_at']]
+        for job in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job['id']]
+
+    def get(self, job_id, wait=0):
+        """Return a public copy of the job; with wait, block until it finishes (or timeout)"""
+        deadline = time.monotonic() + wait
+        with self._lock:
+            job = self._jobs.get(job_id)
+            while job and not job['finished_at'] and wait:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return self._public(job) if job else None
+
+    def list(self):
+        with self._lock:
+            return [self._public(j) for j in reversed(self._jobs.values())]
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers[id(q)] = q
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(id(q), None)
+
+    def _publish(self, job):
+        with self._lock:
+            event = self._public(job)
+            self._changed.notify_all()
+            subscribers = list(self._subscribers.values())
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def _public(self, job):
+        data = {k: v for k, v in job.items() if not k.startswith('_')}
+        data['progress'] = list(job['progress'])
+        return data
+
+
+# Standalone test
+if __name__ == '__main__':
+    print("Testing JobManager...")
+    jobs = JobManager()
+
+    def slow(name, seconds, progress):
+        progress(f"{name} started")
+        time.sleep(seconds)
+        return {'success': True, 'name': name}
+
+    a = jobs.submit('demo', 'sdb1', slow, 'first', 0.5)
+    b = jobs.submit('demo', 'sdb1', slow, 'second', 0.1)   # waits behind "first"
+    c = jobs.submit('demo', 'sdc1', slow, 'other', 0.1)    # runs in parallel
+
+    for job_id in (a, b, c):
+        job = jobs.get(job_id, wait=5)
+        print(f"  {job['result']['name']}: {job['status']} "
+              f"(started {job['started_at'] - job['created_at']:.2f}s after submit)")
@@ -0,0 +1,236 @@
+import configparser
+import hmac
+import os
+import threading
+import time
+
+class MetricsExporter:
+    def __init__(self, system_mgr, storage_mgr, docker_mgr, app_ctrl, config_file='config/settings.ini'):
+        self.system_mgr = system_mgr
+        self.storage_mgr = storage_mgr
+        self.docker_mgr = docker_mgr
+        self.app_ctrl = app_ctrl
+
+        self.interval, self.token = self._load_config(config_file)
+
+        # Scrapes only ever read this string; the refresher replaces it
+        self._text = ''
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Exporter self-monitoring
+        self.refresh_count = 0
+        self.refresh_errors = 0
+        self.refresh_seconds_total = 0.0
+        self.last_refresh_seconds = 0.0
+        self.last_refresh_time = 0.0
+        self._collector_up = {}
+
+    def _load_config(self, config_file):
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        interval = float(config.get('metrics', 'refresh_interval', fallback='15'))
+        token = config.get('metrics', 'token', fallback='').strip()
+        return interval, token
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name='metrics-refresher', daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
+
+    def is_authorized(self, auth_header):
+        """Bearer token check; with no token configured, scrapes are refused"""
+        if not self.token:
+            return False
+        return hmac.compare_digest(auth_header.encode('utf-8'), f'Bearer {self.token}'.encode('utf-8'))
+
+    def render(self):
+        """Return the cached exposition text; never runs collectors"""
+        return self._text
+
+    def refresh(self):
+        started = time.monotonic()
+        lines = []
+        errors = 0
+        collector_status = []
+
+        for name, collector in [
+            ('system', self._collect_system),
+            ('storage', self._collect_storage),
+            ('docker', self._collect_docker),
+            ('apps', self._collect_apps)
+        ]:
+            collector_start = time.monotonic()
+            try:
+                # A failing collector contributes nothing rather than half a family
+                collector_lines = []
+                collector(collector_lines)
+                lines.extend(collector_lines)
+                up = 1
+            except Exception as e:
+                # Only log when a collector starts failing, not on every refresh
+                if self._collector_up.get(name, 1):
+                    print(f"Warning: metrics collector {name} failed: {e}")
+                errors += 1
+                up = 0
+            self._collector_up[name] = up
+            collector_status.append((name, up, round(time.monotonic() - collector_start, 6)))
+
+        duration = time.monotonic() - started
+        self.refresh_count += 1
+        self.refresh_errors += errors
+        self.refresh_seconds_total += duration
+        self.last_refresh_seconds = duration
+        self.last_refresh_time = time.time()
+
+        # Families must stay contiguous in the text format
+        self._header(lines, 'cockpit_collector_up', 'gauge', 'Whether the collector succeeded on the latest refresh')
+        for name, up, _ in collector_status:
+            self._metric(lines, 'cockpit_collector_up', up, {'collector': name})
+        self._header(lines, 'cockpit_collector_duration_seconds', 'gauge', 'Collector run time on the latest refresh')
+        for name, _, seconds in collector_status:
+            self._metric(lines, 'cockpit_collector_duration_seconds', seconds, {'collector': name})
+
+        self._header(lines, 'cockpit_exporter_refreshes_total', 'counter', 'Snapshot refreshes performed')
+        self._metric(lines, 'cockpit_exporter_refreshes_total', self.refresh_count)
+        self._header(lines, 'cockpit_exporter_refresh_errors_total', 'counter', 'Collector failures during refreshes')
+        self._metric(lines, 'cockpit_exporter_refresh_errors_total', self.refresh_errors)
+        self._header(lines, 'cockpit_exporter_refresh_duration_seconds_total', 'counter', 'Time spent refreshing the snapshot')
+        self._metric(lines, 'cockpit_exporter_refresh_duration_seconds_total', round(self.refresh_seconds_total, 6))
+        self._header(lines, 'cockpit_exporter_last_refresh_duration_seconds', 'gauge', 'Duration of the latest refresh')
+        self._metric(lines, 'cockpit_exporter_last_refresh_duration_seconds', round(duration, 6))
+        self._header(lines, 'cockpit_exporter_last_refresh_timestamp_seconds', 'gauge', 'Unix time of the latest refresh')
+        self._metric(lines, 'cockpit_exporter_last_refresh_timestamp_seconds', round(self.last_refresh_time, 3))
+
+        self._text = '\n'.join(lines) + '\n'
+
+    # ---- collectors ----
+
+    def _collect_system(self, lines):
+        stats = self.system_mgr.get_stats()
+
+        self._header(lines, 'cockpit_cpu_usage_percent', 'gauge', 'Overall CPU utilisation')
+        self._metric(lines, 'cockpit_cpu_usage_percent', stats['cpu_percent'])
+        self._header(lines, 'cockpit_cpu_core_usage_percent', 'gauge', 'Per-core CPU utilisation')
+        for core, value in enumerate(stats.get('cpu_per_core', [])):
+            self._metric(lines, 'cockpit_cpu_core_usage_percent', value, {'core': core})
+
+        self._header(lines, 'cockpit_temperature_celsius', 'gauge', 'Hardware temperature sensors')
+        for sensor in stats.get('temperatures', []):
+            self._metric(lines, 'cockpit_temperature_celsius', sensor['temp'],
+                         {'chip': sensor['chip'], 'label': sensor['label'], 'category': sensor['category']})
+        self._header(lines, 'cockpit_cpu_temperature_celsius', 'gauge', 'Representative CPU temperature')
+        self._metric(lines, 'cockpit_cpu_temperature_celsius', stats['cpu_temp'])
+
+        mem = stats['memory']
+        self._header(lines, 'cockpit_memory_total_bytes', 'gauge', 'Total memory')
+        self._metric(lines, 'cockpit_memory_total_bytes', mem.get('total_bytes'))
+        self._header(lines, 'cockpit_memory_used_bytes', 'gauge', 'Used memory')
+        self._metric(lines, 'cockpit_memory_used_bytes', mem.get('used_bytes'))
+        self._header(lines, 'cockpit_memory_available_bytes', 'gauge', 'Available memory')
+        self._metric(lines, 'cockpit_memory_available_bytes', mem.get('available_bytes'))
+
+        for field in ['read_bytes_per_sec', 'write_bytes_per_sec', 'read_iops', 'write_iops', 'busy_percent']:
+            name = 'cockpit_disk_' + field.replace('_per_sec', '_per_second')
+            self._header(lines, name, 'gauge', f'Per-disk {field.replace("_", " ")}')
+            for disk in stats.get('disks', []):
+                self._metric(lines, name, disk.get(field), {'disk': disk['name']})
+
+        for field in ['rx_bytes_per_sec', 'tx_bytes_per_sec']:
+            name = 'cockpit_network_' + field.replace('_per_sec', '_per_second')
+            self._header(lines, name, 'gauge', f'Per-interface {field.replace("_", " ")}')
+            for nic in stats.get('nics', []):
+                self._metric(lines, name, nic[field], {'interface': nic['name']})
+
+        self._header(lines, 'cockpit_stats_sample_age_seconds', 'gauge', 'Age of the host stats sample')
+        self._metric(lines, 'cockpit_stats_sample_age_seconds', stats['sample_age'])
+
+    def _collect_storage(self, lines):
+        info = self.storage_mgr.get_storage_info()
+
+        mounted = []
+        self._header(lines, 'cockpit_partition_mounted', 'gauge', 'Whether a partition is mounted')
+        for disk in info.get('disks', []):
+            for part in disk['partitions']:
+                labels = {'device': part['device'], 'fstype': part['fstype'] or '', 'uuid': part['uuid'] or ''}
+                self._metric(lines, 'cockpit_partition_mounted', 1 if part['is_mounted'] else 0, labels)
+                if part['is_mounted'] and part['mountpoint']:
+                    mounted.append(part)
+
+        usage = []
+        for part in mounted:
+            try:
+                st = os.statvfs(part['mountpoint'])
+            except OSError:
+                continue
+            labels = {'device': part['device'], 'mountpoint': part['mountpoint']}
+            usage.append((labels, st.f_blocks * st.f_frsize, (st.f_blocks - st.f_bfree) * st.f_frsize,
+                          st.f_bavail * st.f_frsize))
+
+        for index, (name, help_text) in enumerate([
+            ('cockpit_filesystem_size_bytes', 'Filesystem size'),
+            ('cockpit_filesystem_used_bytes', 'Filesystem space used'),
+            ('cockpit_filesystem_avail_bytes', 'Filesystem space available to users')
+        ]):
+            self._header(lines, name, 'gauge', help_text)
+            for entry in usage:
+                self._metric(lines, name, entry[index + 1], entry[0])
+
+    def _collect_docker(self, lines):
+        data = self.docker_mgr.list_containers()
+        if 'error' in data:
+            raise Exception(data['error'])
+
+        self._header(lines, 'cockpit_container_running', 'gauge', 'Whether a container is running')
+        for container in data['containers']:
+            running = 1 if container['state'].lower() == 'running' else 0
+            self._metric(lines, 'cockpit_container_running', running,
+                         {'name': container['name'], 'image': container['image']})
+
+    def _collect_apps(self, lines):
+        data = self.app_ctrl.list_apps()
+
+        self._header(lines, 'cockpit_app_running', 'gauge', 'Whether a configured app is running')
+        for app in data['apps']:
+            running = 1 if app['status'] == 'running' else 0
+            self._metric(lines, 'cockpit_app_running', running, {'app': app['name'], 'type': app['type']})
+
+    # ---- text format helpers ----
+
+    def _header(self, lines, name, metric_type, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+    def _metric(self, lines, name, value, labels=None):
+        if value is None:
+            return
+        if labels:
+            label_str = ','.join(f'{k}="{self._escape(v)}"' for k, v in labels.items())
+            lines.append(f'{name}{{{label_str}}} {value}')
+        else:
+            lines.append(f'{name} {value}')
+
+    def _escape(self, value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Standalone test
+if __name__ == '__main__':
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from modules.system import SystemManager
+    from modules.storage import StorageManager
+    from modules.docker_mgr import DockerManager
+    from modules.app_control import AppController
+
+    print("Testing MetricsExporter...")
+    exporter = MetricsExporter(SystemManager(), StorageManager(), DockerManager(), AppController())
+    exporter.refresh()
+    print(exporter.render())
@@ -1,37 +1,394 @@
+import configparser
+import heapq
+import pwd
+import re
+import socket
+import threading
+import time
+from collections import namedtuple
+
 import psutil
 
+try:
+    from modules.procfs import ProcfsReader
+except ImportError:  # standalone test: python3 modules/process.py
+    from procfs import ProcfsReader
+
+# One row of the process snapshot; dicts are only built for rows we return
+ProcRow = namedtuple('ProcRow', ['pid', 'ppid', 'name', 'user', 'rss', 'cpu_percent', 'cgroup'])
+
 class ProcessManager:
-    def get_processes(self):
-        processes = []
-        
-        for proc in psutil.process_iter(['pid', 'name', 'memory_info', 'cpu_percent', 'username']):
+    # sort key -> (row accessor, largest first by default)
+    SORT_KEYS = {
+        'cpu': (lambda r: r.cpu_percent, True),
+        'mem': (lambda r: r.rss, True),
+        'pid': (lambda r: r.pid, False),
+        'name': (lambda r: r.name.lower(), False),
+        'user': (lambda r: r.user, False)
+    }
+    MAX_LIMIT = 500
+    DETAIL_TTL = 3.0
+
+    def __init__(self, config_file=None, min_refresh_interval=1.0, backend=None):
+        # Long-lived table so cpu_percent has a previous sample to diff against
+        self.min_refresh_interval = min_refresh_interval
+        self._table = {}        # pid -> psutil.Process
+        self._cgroups = {}      # pid -> cgroup path, read once per process
+        self._rows = []
+        self._refreshed_at = 0
+        self._uid_names = {}
+        self._lock = threading.Lock()
+        self._details = {}      # pid -> (create_time, fetched_at, detail dict)
+        self._details_lock = threading.Lock()
+
+        # 'auto' uses the direct /proc reader on Linux, psutil elsewhere
+        self.backend = backend or self._load_backend(config_file)
+        self._procfs = None
+        if self.backend in ('auto', 'procfs') and ProcfsReader.available():
+            self._procfs = ProcfsReader()
+            self.backend = 'procfs'
+        else:
+            self.backend = 'psutil'
+
+    def _load_backend(self, config_file):
+        if not config_file:
+            return 'auto'
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        return config.get('processes', 'backend', fallback='auto').strip().lower()
+
+    def refresh(self):
+        """Update the process table and return the current snapshot rows"""
+        with self._lock:
+            now = time.monotonic()
+            if self._rows and now - self._refreshed_at < self.min_refresh_interval:
+                return self._rows
+
+            if self._procfs:
+                rows = self._procfs.read_all(ProcRow)
+            else:
+                rows = self._refresh_psutil()
+
+            self._rows = rows
+            self._refreshed_at = time.monotonic()
+            return rows
+
+    def _refresh_psutil(self):
+        pids = psutil.pids()
+
+        # Drop processes that have exited
+        alive = set(pids)
+        for pid in [pid for pid in self._table if pid not in alive]:
+            del self._table[pid]
+            self._cgroups.pop(pid, None)
+
+        rows = []
+        for pid in pids:
+            row = self._read_process(pid)
+            if row:
+                rows.append(row)
+        return rows
+
+    def _read_process(self, pid, retry=True):
+        proc = self._table.get(pid)
+        is_new = proc is None
+
+        try:
+            if is_new:
+                proc = psutil.Process(pid)
+                self._table[pid] = proc
+
+            # Identity is (pid, create_time): is_running() re-reads the start
+            # time, so a reused pid gets a fresh entry
+            if not is_new and not proc.is_running():
+                del self._table[pid]
+                self._cgroups.pop(pid, None)
+                return self._read_process(pid, retry=False) if retry else None
+
+            with proc.oneshot():
+                cpu = proc.cpu_percent(interval=None)
+                if is_new:
+                    # No previous sample yet - use the lifetime average instead of 0.0
+                    times = proc.cpu_times()
+                    age = max(time.time() - proc.create_time(), 0.001)
+                    cpu = (times.user + times.system) / age * 100
+
+                return ProcRow(
+                    pid,
+                    proc.ppid(),
+                    proc.name(),
+                    self._username(proc.uids().real),
+                    proc.memory_info().rss,
+                    cpu,
+                    self._cgroup(pid)
+                )
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self._table.pop(pid, None)
+            self._cgroups.pop(pid, None)
+            return None
+
+    def _cgroup(self, pid):
+        cgroup = self._cgroups.get(pid)
+        if cgroup is None:
+            # Same proc root as the rest of psutil (PROCFS_PATH), like the procfs backend
+            cgroup = ProcfsReader.read_cgroup(getattr(psutil, 'PROCFS_PATH', '/proc'), pid)
+            self._cgroups[pid] = cgroup
+        return cgroup
+
+    def _username(self, uid):
+        name = self._uid_names.get(uid)
+        if name is None:
             try:
-                pinfo = proc.info
-                mem_mb = pinfo['memory_info'].rss / (1024 * 1024)
-                
-                processes.append({
-                    'pid': pinfo['pid'],
-                    'name': pinfo['name'],
-                    'user': pinfo['username'],
-                    'memory_mb': round(mem_mb, 1),
-                    'cpu_percent': round(pinfo['cpu_percent'] or 0, 1)
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        
-        # Sort by memory usage
-        processes.sort(key=lambda x: x['memory_mb'], reverse=True)
-        
-        # Return top 50 processes
-        return {'processes': processes[:50]}
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self._uid_names[uid] = name
+        return name
+
+    def get_processes(self, sort='mem', order=None, user=None, name=None, name_regex=None,
+                      min_cpu=None, min_mem_mb=None, limit=50, offset=0):
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f'Invalid sort key. Valid: {", ".join(self.SORT_KEYS)}')
+        if order not in (None, 'asc', 'desc'):
+            raise ValueError('Invalid order. Valid: asc, desc')
+        limit = max(0, min(int(limit), self.MAX_LIMIT))
+        offset = max(0, int(offset))
+
+        rows = self._filter_rows(self.refresh(), user, name, name_regex, min_cpu, min_mem_mb)
+        total = len(rows)
+
+        # Only the first offset+limit rows are ever ordered - no full sort
+        key, descending = self.SORT_KEYS[sort]
+        if order:
+            descending = order == 'desc'
+        select = heapq.nlargest if descending else heapq.nsmallest
+        page = select(offset + limit, rows, key=key)[offset:]
+
+        return {
+            'processes': [self._row_to_dict(r) for r in page],
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'sort': sort
+        }
+
+    def _filter_rows(self, rows, user, name, name_regex, min_cpu, min_mem_mb):
+        pattern = None
+        if name_regex:
+            try:
+                pattern = re.compile(name_regex, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f'Invalid name regex: {e}')
+        name = name.lower() if name else None
+        min_rss = float(min_mem_mb) * 1024 * 1024 if min_mem_mb is not None else None
+        min_cpu = float(min_cpu) if min_cpu is not None else None
+
+        if not (user or name or pattern or min_cpu is not None or min_rss is not None):
+            return rows
+
+        result = []
+        for row in rows:
+            if user and row.user != user:
+                continue
+            if name and name not in row.name.lower():
+                continue
+            if pattern and not pattern.search(row.name):
+                continue
+            if min_cpu is not None and row.cpu_percent < min_cpu:
+                continue
+            if min_rss is not None and row.rss < min_rss:
+                continue
+            result.append(row)
+        return result
+
+    AGGREGATE_KEYS = {
+        'user': lambda r: r.user,
+        'cgroup': lambda r: r.cgroup or '/',
+        'name': lambda r: r.name
+    }
+
+    def get_aggregate(self, by='user', limit=50):
+        """Sum RSS and CPU per user, cgroup or process name"""
+        if by not in self.AGGREGATE_KEYS:
+            raise ValueError(f'Invalid grouping. Valid: {", ".join(self.AGGREGATE_KEYS)}')
+        key = self.AGGREGATE_KEYS[by]
+
+        groups = {}
+        for row in self.refresh():
+            group = groups.get(key(row))
+            if group is None:
+                group = groups[key(row)] = [0, 0, 0.0]
+            group[0] += 1
+            group[1] += row.rss
+            group[2] += row.cpu_percent
+
+        top = heapq.nlargest(max(0, min(int(limit), self.MAX_LIMIT)), groups.items(), key=lambda g: g[1][1])
+        return {
+            'by': by,
+            'total_groups': len(groups),
+            'groups': [{
+                'key': name,
+                'count': count,
+                'memory_mb': round(rss / (1024 * 1024), 1),
+                'cpu_percent': round(cpu, 1)
+            } for name, (count, rss, cpu) in top]
+        }
+
+    def get_tree(self, root=None):
+        """Parent/child tree with per-subtree RSS, CPU and descendant counts (None if root is gone)"""
+        rows = self.refresh()
+        nodes = {}
+        for row in rows:
+            node = self._row_to_dict(row)
+            node['ppid'] = row.ppid
+            node['children'] = []
+            node['descendants'] = 0
+            node['_rss'] = row.rss
+            node['_cpu'] = row.cpu_percent
+            nodes[row.pid] = node
+
+        roots = []
+        for row in rows:
+            parent = nodes.get(row.ppid)
+            if parent is not None and row.ppid != row.pid:
+                parent['children'].append(nodes[row.pid])
+            else:
+                roots.append(nodes[row.pid])
+
+        # Children before parents so subtree totals roll up in a single pass
+        order = []
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node['children'])
+
+        for node in reversed(order):
+            for child in node['children']:
+                node['_rss'] += child['_rss']
+                node['_cpu'] += child['_cpu']
+                node['descendants'] += child['descendants'] + 1
+
+        # Parents come first in order, so children still carry their raw totals
+        for node in order:
+            node['children'].sort(key=lambda c: c['_rss'], reverse=True)
+            node['total_memory_mb'] = round(node.pop('_rss') / (1024 * 1024), 1)
+            node['total_cpu_percent'] = round(node.pop('_cpu'), 1)
+
+        if root is not None:
+            if root not in nodes:
+                return None
+            roots = [nodes[root]]
+
+        roots.sort(key=lambda n: n['total_memory_mb'], reverse=True)
+        return {'tree': roots, 'count': len(rows)}
+
+    def get_process_detail(self, pid, uid=None):
+        """Expensive per-process fields, fetched on demand and cached briefly.
+
+        With uid set (non-admin callers), only processes whose real uid
+        matches are shown; others raise PermissionError.
+        """
+        try:
+            proc = psutil.Process(pid)
+            if uid is not None and proc.uids().real != uid:
+                raise PermissionError('You can only inspect your own processes')
+            create_time = proc.create_time()
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            with self._details_lock:
+                self._details.pop(pid, None)
+            return None
+
+        now = time.monotonic()
+        with self._details_lock:
+            cached = self._details.get(pid)
+        # The create_time check means a reused pid never gets stale details
+        if cached and now - cached[1] < self.DETAIL_TTL and cached[0] == create_time:
+            return cached[2]
+
+        try:
+            detail = self._read_detail(proc)
+        except psutil.NoSuchProcess:
+            with self._details_lock:
+                self._details.pop(pid, None)
+            return None
+
+        with self._details_lock:
+            # Drop expired entries so the cache stays small
+            for old_pid in [p for p, entry in self._details.items() if now - entry[1] >= self.DETAIL_TTL]:
+                del self._details[old_pid]
+            self._details[pid] = (create_time, now, detail)
+        return detail
+
+    def _read_detail(self, proc):
+        detail = {'pid': proc.pid}
+
+        # Each field may be denied on its own (e.g. another user's environ)
+        fields = [
+            ('name', lambda: proc.name()),
+            ('user', lambda: proc.username()),
+            ('status', lambda: proc.status()),
+            ('ppid', lambda: proc.ppid()),
+            ('create_time', lambda: proc.create_time()),
+            ('cmdline', lambda: proc.cmdline()),
+            ('exe', lambda: proc.exe()),
+            ('cwd', lambda: proc.cwd()),
+            ('num_threads', lambda: proc.num_threads()),
+            ('num_fds', lambda: proc.num_fds()),
+            ('memory', lambda: proc.memory_info()._asdict()),
+            ('cpu_times', lambda: proc.cpu_times()._asdict()),
+            ('io_counters', lambda: proc.io_counters()._asdict()),
+            ('open_files', lambda: [f.path for f in proc.open_files()]),
+            ('connections', lambda: [self._connection_to_dict(c) for c in self._connections(proc)]),
+            ('environ_size', lambda: len(proc.environ()))
+        ]
+
+        with proc.oneshot():
+            for name, getter in fields:
+                try:
+                    detail[name] = getter()
+                except (psutil.AccessDenied, psutil.ZombieProcess, AttributeError, NotImplementedError):
+                    # ZombieProcess subclasses NoSuchProcess, so it must be caught first
+                    detail[name] = None
+
+        return detail
+
+    def _connections(self, proc):
+        # psutil 6 renamed connections() to net_connections()
+        getter = getattr(proc, 'net_connections', None) or proc.connections
+        return getter(kind='inet')
+
+    def _connection_to_dict(self, conn):
+        return {
+            'fd': conn.fd,
+            'type': 'tcp' if conn.type == socket.SOCK_STREAM else 'udp',
+            'local': f'{conn.laddr.ip}:{conn.laddr.port}' if conn.laddr else '',
+            'remote': f'{conn.raddr.ip}:{conn.raddr.port}' if conn.raddr else '',
+            'status': conn.status
+        }
+
+    def _row_to_dict(self, row):
+        return {
+            'pid': row.pid,
+            'name': row.name,
+            'user': row.user,
+            'memory_mb': round(row.rss / (1024 * 1024), 1),
+            'cpu_percent': round(row.cpu_percent or 0, 1)
+        }
 
 
 # Standalone test
 if __name__ == '__main__':
     print("Testing ProcessManager...")
     pm = ProcessManager()
-    
+
+    pm.refresh()
+    time.sleep(1.5)
+
+    started = time.monotonic()
     data = pm.get_processes()
+    print(f"Backend: {pm.backend}")
+    print(f"Refresh took {(time.monotonic() - started) * 1000:.1f}ms")
     print(f"Top 10 processes by memory:")
     for i, proc in enumerate(data['processes'][:10], 1):
-        print(f"{i}. {proc['name']}: {proc['memory_mb']}MB (CPU: {proc['cpu_percent']}%)")
\ No newline at end of file
+        print(f"{i}. {proc['name']}: {proc['memory_mb']}MB (CPU: {proc['cpu_percent']}%)")
@@ -0,0 +1,189 @@
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+
+class ProcessStream:
+    """One sampling loop shared by every live process-panel viewer.
+
+    Viewers get a full frame first, then deltas (added / removed / changed
+    rows) tagged with a sequence number. A viewer that reconnects with the
+    last position it saw ('<epoch>-<seq>') is replayed the deltas it missed,
+    or sent a new full frame when they are no longer kept. The epoch changes
+    whenever the delta history starts over (server restart, or the loop
+    stopping with its last viewer), so an old position never matches it.
+    """
+
+    def __init__(self, process_mgr, interval=2.0, cpu_threshold=1.0, mem_threshold_mb=1.0, history=30):
+        self.process_mgr = process_mgr
+        self.interval = interval
+        self.cpu_threshold = cpu_threshold
+        self.mem_threshold_mb = mem_threshold_mb
+
+        self._epoch = secrets.token_hex(4)
+        self._seq = 0
+        self._sent = {}                     # pid -> row as last sent to viewers
+        self._deltas = deque(maxlen=history)
+        self._subscribers = {}              # id -> {'queue', 'needs_full'}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, since=None):
+        """since is the id of the last event the viewer saw, if any"""
+        sub = {'queue': queue.Queue(maxsize=64), 'needs_full': True}
+        epoch, seq = self._parse_position(since)
+
+        with self._lock:
+            if self._thread and self._sent:
+                current = epoch == self._epoch
+                missed = [d for d in self._deltas if d['seq'] > seq] if current else []
+                if current and (seq == self._seq or (missed and missed[0]['seq'] == seq + 1)):
+                    # History reaches back to the client's position - replay it
+                    for delta in missed:
+                        sub['queue'].put_nowait(delta)
+                else:
+                    sub['queue'].put_nowait(self._full_frame())
+                sub['needs_full'] = False
+
+            self._subscribers[id(sub)] = sub
+
+            if not self._thread:
+                self._thread = threading.Thread(target=self._loop, name='process-stream', daemon=True)
+                self._thread.start()
+
+        return sub
+
+    def event_id(self, frame):
+        return f"{frame['epoch']}-{frame['seq']}"
+
+    def _parse_position(self, since):
+        """(epoch, seq) from an event id; (None, None) if there is none or it is malformed"""
+        epoch, _, seq = (since or '').rpartition('-')
+        try:
+            return epoch or None, int(seq)
+        except ValueError:
+            return None, None
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.pop(id(sub), None)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Last viewer left; the next one starts from a full frame
+                    self._thread = None
+                    self._sent = {}
+                    self._deltas.clear()
+                    self._epoch = secrets.token_hex(4)
+                    return
+
+            started = time.monotonic()
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"Warning: process stream tick failed: {e}")
+            time.sleep(max(self.interval - (time.monotonic() - started), 0.1))
+
+    def _tick(self):
+        rows = self.process_mgr.refresh()
+        current = {row.pid: row for row in rows}
+
+        with self._lock:
+            added, changed = [], []
+            for pid, row in current.items():
+                previous = self._sent.get(pid)
+                if previous is None:
+                    added.append(row)
+                elif self._has_changed(previous, row):
+                    changed.append(row)
+            removed = [pid for pid in self._sent if pid not in current]
+
+            for row in added + changed:
+                self._sent[row.pid] = row
+            for pid in removed:
+                del self._sent[pid]
+
+            delta = None
+            if added or changed or removed:
+                self._seq += 1
+                delta = {
+                    'type': 'delta',
+                    'epoch': self._epoch,
+                    'seq': self._seq,
+                    'added': [self._row_to_dict(r) for r in added],
+                    'changed': [self._row_to_dict(r) for r in changed],
+                    'removed': removed
+                }
+                self._deltas.append(delta)
+
+            full = None
+            for sub in self._subscribers.values():
+                if sub['needs_full']:
+                    full = full or self._full_frame()
+                    frame = full
+                elif delta:
+                    frame = delta
+                else:
+                    continue
+                try:
+                    sub['queue'].put_nowait(frame)
+                    sub['needs_full'] = False
+                except queue.Full:
+                    # Viewer is too far behind - throw its backlog away and resync
+                    self._drain(sub['queue'])
+                    sub['needs_full'] = True
+
+    def _has_changed(self, previous, row):
+        if previous.name != row.name or previous.user != row.user or previous.ppid != row.ppid:
+            return True
+        if abs(previous.cpu_percent - row.cpu_percent) >= self.cpu_threshold:
+            return True
+        return abs(previous.rss - row.rss) >= self.mem_threshold_mb * 1024 * 1024
+
+    def _full_frame(self):
+        return {
+            'type': 'full',
+            'epoch': self._epoch,
+            'seq': self._seq,
+            'processes': [self._row_to_dict(r) for r in self._sent.values()]
+        }
+
+    def _row_to_dict(self, row):
+        return {
+            'pid': row.pid,
+            'ppid': row.ppid,
+            'name': row.name,
+            'user': row.user,
+            'memory_mb': round(row.rss / (1024 * 1024), 1),
+            'cpu_percent': round(row.cpu_percent, 1)
+        }
+
+    def _drain(self, q):
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+
+
+# Standalone test
+if __name__ == '__main__':
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from modules.process import ProcessManager
+
+    print("Testing ProcessStream...")
+    stream = ProcessStream(ProcessManager(), interval=1.0)
+    sub = stream.subscribe()
+
+    for _ in range(3):
+        frame = sub['queue'].get(timeout=5)
+        if frame['type'] == 'full':
+            print(f"full  seq={frame['seq']} rows={len(frame['processes'])}")
+        else:
+            print(f"delta seq={frame['seq']} +{len(frame['added'])} ~{len(frame['changed'])} -{len(frame['removed'])}")
+    stream.unsubscribe(sub)
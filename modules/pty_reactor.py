@@ -0,0 +1,756 @@
+import configparser
+import errno
+import fcntl
+import os
+import select
+import selectors
+import socket
+import struct
+import termios
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Terminal wire format (WebSocket messages): one or more frames of
+#   type (uint8) | payload length (uint32, big-endian) | payload
+FRAME_OUTPUT = 0x00     # server -> client: raw PTY bytes
+FRAME_INPUT = 0x00      # client -> server: UTF-8 keystrokes
+FRAME_RESIZE = 0x01     # client -> server: rows, cols as two uint16
+FRAME_HEADER = struct.Struct('>BI')
+
+# Sent in place of output dropped by the resync policy: cancel any escape
+# sequence cut in half (CAN), reset attributes and clear the screen. The
+# redraw requested through on_resync follows.
+RESYNC_PREFIX = b'\x18\x1b[0m\x1b[H\x1b[2J'
+
+def pack_frame(frame_type, payload=b''):
+    return FRAME_HEADER.pack(frame_type, len(payload)) + payload
+
+def websocket_frame(payload):
+    """One unmasked binary WebSocket frame (RFC 6455), as a server sends it"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('>BB', 0x82, length)
+    elif length < 65536:
+        header = struct.pack('>BBH', 0x82, 126, length)
+    else:
+        header = struct.pack('>BBQ', 0x82, 127, length)
+    return header + payload
+
+def iter_frames(message):
+    """Yield (type, payload) for each complete frame in a message"""
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(message):
+        frame_type, length = FRAME_HEADER.unpack_from(message, offset)
+        offset += FRAME_HEADER.size
+        yield frame_type, message[offset:offset + length]
+        offset += length
+
+class Scrollback:
+    """Ring buffer of the most recent output of one tmux session, capped at limit bytes.
+
+    Not locked itself: the reactor only touches it while holding its own lock.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._ring = bytearray()        # grows to limit, then wraps
+        self._pos = 0                   # oldest byte once full
+        self._wrapped = False           # older output has been overwritten
+
+    def __len__(self):
+        return len(self._ring)
+
+    def append(self, data):
+        if len(data) >= self.limit:
+            self._wrapped = self._wrapped or len(self._ring) + len(data) > self.limit
+            self._ring[:] = data[-self.limit:]
+            self._pos = 0
+            return
+        room = self.limit - len(self._ring)
+        if room:
+            self._ring += data[:room]
+            data = data[room:]
+            if not data:
+                return
+        self._wrapped = True
+        first = min(len(data), self.limit - self._pos)
+        self._ring[self._pos:self._pos + first] = data[:first]
+        self._ring[:len(data) - first] = data[first:]
+        self._pos = (self._pos + len(data)) % self.limit
+
+    def snapshot(self):
+        """The buffered output in order; once wrapped, cut to a clean starting point"""
+        if not self._wrapped:
+            return bytes(self._ring)
+        data = self._ring[self._pos:] + self._ring[:self._pos]
+        start = 0
+        while start < len(data) and 0x80 <= data[start] < 0xc0:
+            start += 1      # UTF-8 continuation bytes of a character cut in half
+        # CAN aborts an escape sequence the cut may have started in the middle of
+        return b'\x18' + bytes(data[start:])
+
+
+class Subscriber:
+    """One viewer of a PTY.
+
+    Push subscribers (WebSockets) hand over their connected socket. The
+    reactor thread writes their output to it itself, as binary WebSocket
+    frames sent with MSG_DONTWAIT, and waits for the socket to become
+    writable when the peer is slow. So a peer that stops reading holds no
+    thread: only its own queue grows, into the reactor's high-water policy.
+    (Only output is written this way; the WebSocket library keeps the socket
+    for everything else. Plain sockets only - TLS ends at the reverse proxy.)
+    Pull subscribers (SSE generators) call read() from their own thread.
+
+    depth() is the output queued for this viewer and not yet written to its
+    socket; the reactor keeps it under its high-water mark.
+    """
+
+    def __init__(self, reactor, key, sock=None, on_close=None):
+        self.reactor = reactor
+        self.key = key
+        self.sock = sock
+        self.on_close = on_close
+        self.closed = False
+
+        self._buffer = bytearray()      # output not framed yet
+        self._out = bytearray()         # framed bytes the socket has not taken yet
+        self._eof = False
+        self._cond = threading.Condition()
+
+        self.over = False               # paused the PTY; resume once drained
+        self.waiting = False            # registered with the reactor for EVENT_WRITE
+
+    def depth(self):
+        with self._cond:
+            return len(self._buffer) + len(self._out)
+
+    def feed(self, data, pause=False):
+        """Queue new output (None at EOF); the caller holds the reactor lock.
+
+        Returns True when this viewer is now over the reactor's buffer_limit.
+        With pause, it is also marked to resume the PTY once it has drained.
+        """
+        with self._cond:
+            if self.closed:
+                return False
+            if data is None:
+                self._eof = True
+            else:
+                self._buffer += data
+            self._cond.notify()
+        if self.sock is not None:
+            self.reactor._pump(self)
+        with self._cond:
+            # Only the unsent queue counts: the frame in _out is bounded by the previous queue
+            if data is None or self.closed or len(self._buffer) < self.reactor.buffer_limit:
+                return False
+            # Set under _cond so a read draining right now still sees it
+            self.over = pause
+            return True
+
+    def resync(self):
+        """Drop the queued backlog for RESYNC_PREFIX; returns the bytes dropped.
+
+        A frame already partly written stays, so the WebSocket stream stays intact.
+        """
+        with self._cond:
+            dropped = len(self._buffer)
+            self._buffer[:] = RESYNC_PREFIX
+        if self.sock is not None:
+            self.reactor._pump(self)
+        return dropped
+
+    def _drained(self):
+        """Caller holds _cond: True if this viewer paused the PTY and has now caught up"""
+        if self.over and len(self._buffer) + len(self._out) <= self.reactor.low_water:
+            self.over = False
+            return True
+        return False
+
+    def _write(self):
+        """Push subscribers, reactor lock held: send what the socket takes without blocking.
+
+        Returns (state, resume): state is 'blocked' (wait for EVENT_WRITE),
+        'idle', 'done' (EOF sent) or 'failed'; resume as for _drained().
+        """
+        with self._cond:
+            if self.closed:
+                return 'failed', False
+            while self._out or self._buffer:
+                if not self._out:
+                    self._out = bytearray(websocket_frame(pack_frame(FRAME_OUTPUT, self._buffer)))
+                    self._buffer.clear()
+                try:
+                    sent = self.sock.send(self._out, socket.MSG_DONTWAIT)
+                except (BlockingIOError, InterruptedError):
+                    return 'blocked', self._drained()
+                except (OSError, ValueError):
+                    self.closed = True
+                    return 'failed', False
+                del self._out[:sent]
+            if self._eof:
+                self.closed = True
+                return 'done', False
+            return 'idle', self._drained()
+
+    def read(self, timeout=None):
+        """Pull subscribers: wait for output; b'' on timeout, None once closed"""
+        resume = False
+        with self._cond:
+            if not self._buffer and not self._eof and not self.closed:
+                self._cond.wait(timeout)
+            if self._buffer:
+                data = bytes(self._buffer)
+                self._buffer.clear()
+                resume = self._drained()
+            elif self._eof or self.closed:
+                data = None
+            else:
+                data = b''
+        if resume:
+            self.reactor._resume(self.key)
+        return data
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class PtyReactor:
+    """One thread multiplexing every terminal PTY through a selector (epoll).
+
+    A PTY is only read while it has subscribers; until then its output stays
+    in the kernel buffer, so nothing is lost between connect and the first
+    viewer. Idle PTYs cost nothing: no wakeups, no keepalive traffic.
+
+    Output is coalesced per PTY: an isolated small read (a keystroke echo) is
+    dispatched at once, but reads that follow closely are merged for a short
+    window. The window doubles while flushes come out large (2ms up to 8ms)
+    and halves again as output calms down, so a scrolling build turns into a
+    few hundred big frames per second instead of thousands of tiny ones.
+
+    Each viewer's queue is bounded by buffer_limit ([terminal] in
+    settings.ini). When a viewer falls that far behind, the overflow policy
+    applies: 'pause' stops reading the PTY until it has drained to a quarter
+    of the limit, so the kernel blocks the writer; 'resync' drops that
+    viewer's backlog and asks for a full redraw (on_resync) instead. Pause is
+    only used while the PTY has a single viewer: with several, the slow one
+    is resynced so the others keep going.
+
+    PTYs registered with a history name also record their output in a
+    Scrollback of up to `scrollback` bytes that outlives the PTY; a new
+    viewer gets it as its first frame, before any live output.
+
+    Any number of viewers can share one PTY: output fans out to all of them,
+    input from all of them is written in turn. A viewer joining a PTY that is
+    already being watched also triggers on_resync, so it gets a full screen.
+    """
+
+    OVERFLOW_POLICIES = ('pause', 'resync')
+
+    def __init__(self, config_file=None, read_size=65536, callback_workers=4, min_window=0.002,
+                 max_window=0.008, max_pending=262144, write_timeout=10.0):
+        self.read_size = read_size
+        self.write_timeout = write_timeout
+        self.min_window = min_window
+        self.max_window = max_window
+        self.max_pending = max_pending
+        self.buffer_limit = 1048576
+        self.overflow = 'pause'
+        self.scrollback = 262144
+        self._load_config(config_file)
+        self.low_water = self.buffer_limit // 4
+
+        self._selector = selectors.DefaultSelector()
+        self._ptys = {}                 # key -> {'key', 'fd', 'subscribers', 'on_eof', 'reading', ...}
+        self._histories = {}            # history name -> Scrollback
+        self._lock = threading.RLock()
+        self._thread = None
+        # on_eof/on_resync run here (tmux commands, signals); output never does
+        self._callbacks = ThreadPoolExecutor(max_workers=callback_workers, thread_name_prefix='pty-callback')
+
+        # Self-pipe so register/unregister can interrupt a blocking select()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def _load_config(self, config_file):
+        if not config_file:
+            return
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        self.buffer_limit = max(config.getint('terminal', 'buffer_limit', fallback=self.buffer_limit),
+                                self.max_pending)
+        self.scrollback = max(config.getint('terminal', 'scrollback', fallback=self.scrollback), 0)
+        overflow = config.get('terminal', 'overflow', fallback=self.overflow).strip().lower()
+        if overflow in self.OVERFLOW_POLICIES:
+            self.overflow = overflow
+        else:
+            print(f"Warning: unknown [terminal] overflow '{overflow}', using '{self.overflow}'")
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name='pty-reactor', daemon=True)
+            self._thread.start()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass    # already pending
+
+    # ---------- PTY registry ----------
+
+    def register(self, key, fd, on_eof=None, on_resync=None, history=None):
+        """Hand a PTY master fd to the reactor.
+
+        on_eof(key) runs when the child side closes; on_resync(key) should make
+        the program redraw its screen (resync overflow policy). Output is kept
+        in the scrollback named history (e.g. the tmux session), if given.
+        """
+        os.set_blocking(fd, False)
+        with self._lock:
+            scrollback = self._history(history) if history else None
+            self._ptys[key] = {
+                'key': key,
+                'fd': fd,
+                'subscribers': set(),
+                'on_eof': on_eof,
+                'on_resync': on_resync,
+                'write_lock': threading.Lock(),   # one viewer's input at a time
+                'fd_lock': threading.Lock(),      # held around os.write; unregister takes it
+                'closed': False,                  # unregistered: the fd may be closed and reused
+                'history': scrollback,
+                'reading': False,
+                'paused': False,            # stopped for a viewer over buffer_limit
+                'paused_at': None,
+                'stalls': 0,
+                'stalled_seconds': 0.0,
+                'resyncs': 0,
+                'dropped_bytes': 0,
+                'pending': bytearray(),     # output waiting for the flush window
+                'deadline': None,
+                'window': self.min_window,
+                'last_flush': 0.0
+            }
+
+    def unregister(self, key):
+        """Stop watching key's fd; its subscribers are closed. The caller closes the fd."""
+        with self._lock:
+            entry = self._ptys.pop(key, None)
+            if not entry:
+                return
+            self._stop_reading(entry)
+            # No write() can reach the fd after this, so the caller may close it
+            with entry['fd_lock']:
+                entry['closed'] = True
+            # Viewers get what is queued, then EOF
+            for sub in list(entry['subscribers']):
+                sub.feed(None)
+
+    # ---------- scrollback ----------
+
+    def _history(self, name):
+        if name not in self._histories and self.scrollback:
+            self._histories[name] = Scrollback(self.scrollback)
+        return self._histories.get(name)
+
+    def has_history(self, name):
+        with self._lock:
+            return bool(self._histories.get(name))
+
+    def seed_history(self, name, data):
+        """Start an empty scrollback from a snapshot (e.g. tmux capture-pane)"""
+        with self._lock:
+            scrollback = self._history(name)
+            if scrollback is not None and not scrollback:
+                scrollback.append(data)
+
+    def drop_history(self, name):
+        with self._lock:
+            self._histories.pop(name, None)
+
+    def _start_reading(self, entry):
+        if not entry['reading'] and not entry['paused']:
+            self._selector.register(entry['fd'], selectors.EVENT_READ, entry)
+            entry['reading'] = True
+            self._wake()
+
+    def _stop_reading(self, entry):
+        if entry['reading']:
+            try:
+                self._selector.unregister(entry['fd'])
+            except (KeyError, ValueError):
+                pass
+            entry['reading'] = False
+            entry['pending'].clear()
+            entry['deadline'] = None
+            self._wake()
+        self._unpause(entry)
+
+    def _pause(self, entry):
+        """Leave output in the kernel buffer until slow viewers catch up"""
+        if entry['reading']:
+            try:
+                self._selector.unregister(entry['fd'])
+            except (KeyError, ValueError):
+                pass
+            entry['reading'] = False
+        if not entry['paused']:
+            entry['paused'] = True
+            entry['paused_at'] = time.monotonic()
+            entry['stalls'] += 1
+
+    def _unpause(self, entry):
+        if entry['paused']:
+            entry['paused'] = False
+            entry['stalled_seconds'] += time.monotonic() - entry['paused_at']
+            entry['paused_at'] = None
+
+    def _resume(self, key):
+        """A viewer has drained: read again once no viewer is still over the mark"""
+        with self._lock:
+            entry = self._ptys.get(key)
+            if not entry or not entry['paused']:
+                return
+            if any(sub.over for sub in entry['subscribers']):
+                return
+            self._unpause(entry)
+            if entry['subscribers']:
+                self._start_reading(entry)
+
+    def subscribe(self, key, sock=None, on_close=None):
+        """Attach a viewer to key; returns the Subscriber, or None if key is unknown.
+
+        sock: a WebSocket's socket to push output to (see Subscriber); without
+        it the viewer pulls with read(). on_close runs once a push viewer's
+        output has ended (EOF sent or the socket failed).
+        """
+        with self._lock:
+            entry = self._ptys.get(key)
+            if not entry:
+                return None
+            sub = Subscriber(self, key, sock, on_close)
+            if entry['history']:
+                # Recent screen first; live output queues up behind it
+                sub.feed(entry['history'].snapshot())
+            if entry['paused']:
+                # Paused for the only viewer so far: now that there are two,
+                # that one is resynced instead of holding up the newcomer
+                for other in entry['subscribers']:
+                    if other.over:
+                        other.over = False
+                        entry['dropped_bytes'] += other.resync()
+                        entry['resyncs'] += 1
+                self._unpause(entry)
+            if entry['subscribers'] and entry['on_resync']:
+                # A new attachment draws itself; joining a live one needs a repaint
+                self._callbacks.submit(entry['on_resync'], key)
+            entry['subscribers'].add(sub)
+            self._start_reading(entry)
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._stop_writing(sub)
+            entry = self._ptys.get(sub.key)
+            if entry:
+                entry['subscribers'].discard(sub)
+                if not entry['subscribers']:
+                    # Nobody is watching: leave output in the kernel buffer
+                    self._stop_reading(entry)
+                elif entry['paused'] and not any(s.over for s in entry['subscribers']):
+                    self._unpause(entry)    # the slow viewer left
+                    self._start_reading(entry)
+        sub.close()
+
+    # ---------- input ----------
+
+    def write(self, key, data):
+        """Write input to key's PTY; TimeoutError if it accepts none for write_timeout seconds"""
+        with self._lock:
+            entry = self._ptys.get(key)
+            if not entry:
+                raise KeyError(key)
+            fd = entry['fd']
+        view = memoryview(data)
+        with entry['write_lock']:
+            poller = None
+            deadline = time.monotonic() + self.write_timeout
+            while view:
+                try:
+                    # The fd is only used under fd_lock and while still registered:
+                    # once unregistered it may be closed and its number reused
+                    with entry['fd_lock']:
+                        if entry['closed']:
+                            raise KeyError(key)
+                        written = os.write(fd, view)
+                except BlockingIOError:
+                    # Input queue full (e.g. a big paste): wait for the program to read,
+                    # but not forever - a stopped program never will
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f'Terminal input not accepted for {self.write_timeout:g}s')
+                    if poller is None:
+                        poller = select.poll()
+                        poller.register(fd, select.POLLOUT)
+                    poller.poll(min(remaining, 1.0) * 1000)
+                    continue
+                view = view[written:]
+                deadline = time.monotonic() + self.write_timeout
+
+    def resize(self, key, rows, cols):
+        with self._lock:
+            entry = self._ptys.get(key)
+            if not entry:
+                raise KeyError(key)
+            fcntl.ioctl(entry['fd'], termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+
+    # ---------- reactor loop ----------
+
+    def _loop(self):
+        while True:
+            try:
+                self._run_once()
+            except Exception as e:
+                # Not tied to one PTY (those are dropped in _run_once): keep going
+                print(f"Warning: PTY reactor error: {e}")
+                time.sleep(0.1)
+
+    def _run_once(self):
+        events = self._selector.select(self._next_timeout())
+        now = time.monotonic()
+        finished = []
+
+        with self._lock:
+            for key, _ in events:
+                entry = key.data
+                if entry is None:
+                    try:
+                        while os.read(self._wake_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                if isinstance(entry, Subscriber):
+                    if entry.waiting:       # not unsubscribed while we were selecting
+                        self._pump(entry)   # a slow viewer's socket has room again
+                    continue
+                if not entry['reading']:
+                    continue    # unsubscribed/unregistered while we were selecting
+
+                try:
+                    data, eof = self._drain(entry['fd'])
+                    if data:
+                        self._buffer_output(entry, data, now)
+                    if eof:
+                        self._dispatch(entry, now)
+                        self._stop_reading(entry)
+                        finished.append(entry)
+                except Exception as e:
+                    self._drop(entry, e)
+                    finished.append(entry)
+
+            # Flush windows that have run out
+            for entry in list(self._ptys.values()):
+                if entry['deadline'] is not None and entry['deadline'] <= now:
+                    try:
+                        self._dispatch(entry, now)
+                    except Exception as e:
+                        self._drop(entry, e)
+                        finished.append(entry)
+
+            for entry in finished:
+                for sub in list(entry['subscribers']):
+                    try:
+                        sub.feed(None)
+                    except Exception as e:
+                        print(f"Warning: closing a viewer of PTY {entry['key']} failed: {e}")
+
+        for entry in finished:
+            if entry['on_eof']:
+                # Cleanup may run tmux commands - keep it off the reactor thread
+                self._callbacks.submit(entry['on_eof'], entry['key'])
+
+    # ---------- push subscribers ----------
+
+    def _pump(self, sub):
+        """Caller holds _lock: write what sub's socket takes, then wait for room or finish"""
+        state, resume = sub._write()
+        if state == 'blocked':
+            if not sub.waiting:
+                try:
+                    self._selector.register(sub.sock.fileno(), selectors.EVENT_WRITE, sub)
+                    sub.waiting = True
+                    self._wake()
+                except (KeyError, ValueError, OSError) as e:
+                    print(f"Warning: cannot wait on a viewer socket: {e}")
+                    sub.close()
+                    state = 'failed'
+        else:
+            self._stop_writing(sub)
+        if state in ('done', 'failed') and sub.on_close:
+            sub.on_close, on_close = None, sub.on_close
+            self._callbacks.submit(on_close)
+        if resume:
+            self._resume(sub.key)
+
+    def _stop_writing(self, sub):
+        if sub.waiting:
+            try:
+                self._selector.unregister(sub.sock.fileno())
+            except (KeyError, ValueError, OSError):
+                pass
+            sub.waiting = False
+
+    def _drop(self, entry, error):
+        """Caller holds _lock: a PTY that failed is handled as if it had closed"""
+        print(f"Warning: dropping PTY {entry['key']}: {error}")
+        if self._ptys.get(entry['key']) is entry:
+            del self._ptys[entry['key']]
+        entry['pending'].clear()
+        self._stop_reading(entry)
+
+    def _drain(self, fd):
+        """Read what is available, up to read_size; the tty layer hands out ~4 KB per read()"""
+        chunks = []
+        total = 0
+        eof = False
+        while total < self.read_size:
+            try:
+                chunk = os.read(fd, self.read_size - total)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno != errno.EIO:
+                    print(f"Warning: PTY read failed: {e}")
+                eof = True     # EIO: the child side has closed
+                break
+            if not chunk:
+                eof = True
+                break
+            chunks.append(chunk)
+            total += len(chunk)
+        return b''.join(chunks), eof
+
+    def _next_timeout(self):
+        with self._lock:
+            deadlines = [e['deadline'] for e in self._ptys.values() if e['deadline'] is not None]
+        if not deadlines:
+            return None
+        return max(min(deadlines) - time.monotonic(), 0)
+
+    def _buffer_output(self, entry, data, now):
+        entry['pending'] += data
+        if len(entry['pending']) >= self.max_pending:
+            self._dispatch(entry, now)
+        elif entry['deadline'] is None:
+            if len(data) < self.read_size and now - entry['last_flush'] >= entry['window']:
+                self._dispatch(entry, now)      # isolated output: no added latency
+            else:
+                entry['deadline'] = now + entry['window']
+
+    def _dispatch(self, entry, now):
+        entry['deadline'] = None
+        if not entry['pending']:
+            return
+        data = bytes(entry['pending'])
+        entry['pending'].clear()
+
+        # Big flushes mean output is streaming: merge over a longer window
+        if len(data) >= 16384:
+            entry['window'] = min(entry['window'] * 2, self.max_window)
+        else:
+            entry['window'] = max(entry['window'] / 2, self.min_window)
+        entry['last_flush'] = now
+
+        if entry['history'] is not None:
+            entry['history'].append(data)
+        # Pausing stalls every viewer of the PTY, so only do it for a lone one
+        pause = self.overflow == 'pause' and len(entry['subscribers']) == 1
+        for sub in list(entry['subscribers']):
+            if not sub.feed(data, pause):
+                continue
+            if pause:
+                self._pause(entry)
+                continue
+            entry['dropped_bytes'] += sub.resync()
+            entry['resyncs'] += 1
+            if entry['on_resync']:
+                self._callbacks.submit(entry['on_resync'], entry['key'])
+
+    def terminal_stats(self, key):
+        """Buffer depth and stall counters for one PTY, or None if unknown"""
+        with self._lock:
+            entry = self._ptys.get(key)
+            if not entry:
+                return None
+            stalled = entry['stalled_seconds']
+            if entry['paused']:
+                stalled += time.monotonic() - entry['paused_at']
+            depths = [sub.depth() for sub in entry['subscribers']]
+            return {
+                'viewers': len(depths),
+                'reading': entry['reading'],
+                'paused': entry['paused'],
+                'pending': len(entry['pending']),
+                'buffered': depths,
+                'buffered_max': max(depths, default=0),
+                'buffer_limit': self.buffer_limit,
+                'overflow': self.overflow,
+                'stalls': entry['stalls'],
+                'stalled_seconds': round(stalled, 3),
+                'resyncs': entry['resyncs'],
+                'dropped_bytes': entry['dropped_bytes'],
+                'scrollback': len(entry['history']) if entry['history'] is not None else None
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ptys': len(self._ptys),
+                'reading': sum(1 for e in self._ptys.values() if e['reading']),
+                'paused': sum(1 for e in self._ptys.values() if e['paused']),
+                'subscribers': sum(len(e['subscribers']) for e in self._ptys.values()),
+                'scrollbacks': len(self._histories),
+                'scrollback_bytes': sum(len(h) for h in self._histories.values())
+            }
+
+
+# Standalone test
+if __name__ == '__main__':
+    import pty
+
+    print("Testing PtyReactor...")
+    reactor = PtyReactor()
+    reactor.start()
+
+    ended = threading.Event()
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.execvp('sh', ['sh', '-c', 'sleep 0.2; echo hello from the pty; sleep 0.2'])
+
+    reactor.register('demo', fd, on_eof=lambda key: ended.set())
+    server_side, viewer = socket.socketpair()
+    sub = reactor.subscribe('demo', sock=server_side)
+    print(f"  threads while idle: {threading.active_count()}")
+
+    ended.wait(5)
+    time.sleep(0.1)
+    viewer.setblocking(False)
+    raw = viewer.recv(65536)
+    received = []
+    while len(raw) >= 2:
+        length = raw[1] & 0x7f     # short frames only in this demo
+        received += [payload for _, payload in iter_frames(raw[2:2 + length])]
+        raw = raw[2 + length:]
+    print(f"  received: {b''.join(received)!r}")
+    reactor.unregister('demo')
+    os.close(fd)
+    os.waitpid(pid, 0)
@@ -0,0 +1,133 @@
+import glob
+import os
+
+class TemperatureSensors:
+    # hwmon chip / thermal zone names grouped into the categories we report
+    CPU_CHIPS = ('coretemp', 'k10temp', 'zenpower', 'cpu_thermal', 'cpu-thermal', 'x86_pkg_temp', 'soc_thermal')
+    CPU_LABELS = ('package', 'tctl', 'tdie', 'cpu')
+
+    def __init__(self, hwmon_root='/sys/class/hwmon', thermal_root='/sys/class/thermal'):
+        self.hwmon_root = hwmon_root
+        self.thermal_root = thermal_root
+        self.sensors = []
+        self.discover()
+
+    def discover(self):
+        """Scan hwmon and thermal zones once and keep working sensor files open"""
+        self.close()
+        chips_seen = set()
+
+        for chip_dir in sorted(glob.glob(os.path.join(self.hwmon_root, 'hwmon*'))):
+            chip = self._read_text(os.path.join(chip_dir, 'name')) or os.path.basename(chip_dir)
+            chips_seen.add(chip)
+
+            for input_file in sorted(glob.glob(os.path.join(chip_dir, 'temp*_input'))):
+                label = self._read_text(input_file.replace('_input', '_label'))
+                if not label:
+                    label = os.path.basename(input_file).replace('_input', '')
+                self._add_sensor(input_file, chip, label)
+
+        for zone_dir in sorted(glob.glob(os.path.join(self.thermal_root, 'thermal_zone*'))):
+            zone_type = self._read_text(os.path.join(zone_dir, 'type')) or os.path.basename(zone_dir)
+            # Most thermal zones are also exported through hwmon
+            if zone_type in chips_seen:
+                continue
+            self._add_sensor(os.path.join(zone_dir, 'temp'), zone_type, os.path.basename(zone_dir))
+
+        return len(self.sensors)
+
+    def _add_sensor(self, path, chip, label):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+
+        temp = self._read_fd(fd)
+        if temp is None:
+            os.close(fd)
+            return
+
+        self.sensors.append({
+            'fd': fd,
+            'path': path,
+            'chip': chip,
+            'label': label,
+            'category': self._categorize(chip)
+        })
+
+    def _categorize(self, chip):
+        chip = chip.lower()
+        if chip in self.CPU_CHIPS:
+            return 'cpu'
+        if chip.startswith('nvme'):
+            return 'nvme'
+        if chip.startswith('pch_') or chip.startswith('chipset'):
+            return 'chipset'
+        if chip.startswith('acpitz'):
+            return 'acpi'
+        return 'other'
+
+    def _read_text(self, path):
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return ''
+
+    def _read_fd(self, fd):
+        try:
+            # sysfs attributes are regenerated on every read from offset 0
+            temp = int(os.pread(fd, 32, 0)) / 1000.0
+        except (OSError, ValueError):
+            return None
+        if 0 < temp < 150:  # Sanity check
+            return round(temp, 1)
+        return None
+
+    @property
+    def available(self):
+        return bool(self.sensors)
+
+    def read_all(self):
+        return [{
+            'chip': sensor['chip'],
+            'label': sensor['label'],
+            'category': sensor['category'],
+            'temp': self._read_fd(sensor['fd'])
+        } for sensor in self.sensors]
+
+    def cpu_temperature(self, readings):
+        """Pick the most representative CPU reading from read_all() output"""
+        cpu = [r for r in readings if r['category'] == 'cpu' and r['temp'] is not None]
+
+        for reading in cpu:
+            if reading['label'].lower().startswith(self.CPU_LABELS):
+                return reading['temp']
+        if cpu:
+            return max(r['temp'] for r in cpu)
+
+        # No known CPU chip - fall back to the first working sensor (old behaviour)
+        for reading in readings:
+            if reading['temp'] is not None:
+                return reading['temp']
+        return None
+
+    def close(self):
+        for sensor in self.sensors:
+            try:
+                os.close(sensor['fd'])
+            except OSError:
+                pass
+        self.sensors = []
+
+
+# Standalone test
+if __name__ == '__main__':
+    print("Testing TemperatureSensors...")
+    ts = TemperatureSensors()
+    print(f"Discovered {len(ts.sensors)} sensors")
+
+    readings = ts.read_all()
+    for r in readings:
+        print(f"  - [{r['category']}] {r['chip']} {r['label']}: {r['temp']}°C")
+    print(f"CPU temperature: {ts.cpu_temperature(readings)}")
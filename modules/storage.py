@@ -1,45 +1,90 @@
 import subprocess
+import threading
 import json
+import time
 import os
+import stat
+
+try:
+    from modules.config_cache import ConfigFile
+except ImportError:  # standalone test: python3 modules/storage.py
+    from config_cache import ConfigFile
 
 class StorageManager:
     def __init__(self):
         # User must configure internal UUIDs in config/internal_uuids.txt
         self.internal_config_file = 'config/internal_uuids.txt'
+        self.internal_config = ConfigFile(self.internal_config_file, self._parse_internal_config, default={})
         self.mount_base = '/mnt/drive'
         self.mount_base_private = '/mnt/pvt_drive'
         self.mount_base_public = '/mnt/shared'
+        
+        # Native backend sources; lsblk/df are only used if these fail
+        self.sys_block = '/sys/block'
+        self.mountinfo_file = '/proc/self/mountinfo'
+        self.by_uuid_dir = '/dev/disk/by-uuid'
+        self.udev_data_dir = '/run/udev/data'
+        self.mount_timeout = 300
+        
+        # Disk topology is cached until invalidate() (see StorageWatcher);
+        # without a watcher it expires after topology_ttl. Usage has its own timer.
+        self.topology_ttl = 30
+        self.usage_ttl = 10
+        self._topology = None
+        self._topology_time = 0
+        self._usage = None
+        self._usage_time = 0
+        self._cache_lock = threading.Lock()
+    
+    def invalidate(self):
+        """Forget cached topology and usage (mount change, hotplug, our own mount calls)"""
+        with self._cache_lock:
+            self._topology = None
+            self._usage = None
     
     def _load_internal_config(self):
+        """Internal UUIDs with show flag, re-parsed only when the file changes"""
+        return self.internal_config.get()
+    
+    def _parse_internal_config(self, text):
         """
-        Load internal UUIDs with show flag
+        Parse internal UUIDs with show flag
         Format: UUID,show_flag
         Example:
         12345678-90ab-cdef-1234-567890abcdef,true
         abcdef12-3456-7890-abcd-ef1234567890,false
         """
         config = {}
-        if not os.path.exists(self.internal_config_file):
-            return config
-        
-        with open(self.internal_config_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    parts = line.split(',')
-                    if len(parts) == 2:
-                        uuid = parts[0].strip()
-                        show_flag = parts[1].strip().lower() == 'true'
-                        config[uuid] = show_flag
+        for line in text.splitlines():
+            line = line.strip()
+            if line and not line.startswith('#'):
+                parts = line.split(',')
+                if len(parts) == 2:
+                    uuid = parts[0].strip()
+                    show_flag = parts[1].strip().lower() == 'true'
+                    config[uuid] = show_flag
         return config
     
-    def _run_command(self, cmd):
+    def _run_command(self, cmd, timeout=10):
         try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10)
+            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout)
             return result.stdout.strip(), result.stderr.strip(), result.returncode
         except subprocess.TimeoutExpired:
             return '', 'Command timeout', 1
     
+    def _format_size(self, size_bytes):
+        """Human readable size in lsblk/df -h style (1024 based)"""
+        value = float(size_bytes)
+        for unit in ['B', 'K', 'M', 'G', 'T']:
+            if value < 1024 or unit == 'T':
+                break
+            value /= 1024
+        if unit == 'B':
+            return f"{int(value)}B"
+        # One decimal like lsblk ("931.5G"), without a trailing ".0" ("16G")
+        text = f"{value:.1f}"
+        return f"{text[:-2] if text.endswith('.0') else text}{unit}"
+    
     def _parse_size_mb(self, size_str):
         """Convert size string to MB for comparison"""
         size_str = size_str.upper().replace(' ', '')
@@ -60,6 +105,217 @@ class StorageManager:
                 return 0
     
     def get_storage_info(self):
+        try:
+            return self._get_storage_info_native()
+        except Exception as e:
+            print(f"Warning: native storage scan failed, using lsblk: {e}")
+            return self._get_storage_info_lsblk()
+    
+    def _get_storage_info_native(self):
+        """Build the disk tree from cached topology plus statvfs usage - no subprocesses"""
+        now = time.monotonic()
+        with self._cache_lock:
+            expired = self.topology_ttl is not None and now - self._topology_time > self.topology_ttl
+            if self._topology is None or expired:
+                self._topology = self._scan_topology()
+                self._topology_time = now
+                self._usage = None
+            devices = self._topology
+            
+            if self._usage is None or now - self._usage_time > self.usage_ttl:
+                self._usage = self._scan_usage(devices)
+                self._usage_time = now
+            usage_map = self._usage
+        
+        internal_config = self._load_internal_config()
+        
+        result = []
+        for device in devices:
+            disk_info = self._process_disk(device, usage_map, internal_config)
+            if disk_info:
+                result.append(disk_info)
+        
+        return {'disks': result}
+    
+    def _scan_topology(self):
+        """Disks and partitions from /sys/block, mountinfo, by-uuid and udev"""
+        mounts = self._read_mountinfo()
+        uuids = self._read_uuids()
+        
+        devices = []
+        for name in sorted(os.listdir(self.sys_block)):
+            disk_dir = os.path.join(self.sys_block, name)
+            # Real disks have a backing device; loop, ram, dm and md devices don't
+            if not os.path.exists(os.path.join(disk_dir, 'device')):
+                continue
+            
+            children = []
+            for part in sorted(os.listdir(disk_dir)):
+                part_dir = os.path.join(disk_dir, part)
+                if not os.path.exists(os.path.join(part_dir, 'partition')):
+                    continue
+                
+                dev = self._read_sys(os.path.join(part_dir, 'dev'))
+                size_bytes = int(self._read_sys(os.path.join(part_dir, 'size')) or 0) * 512
+                mount = mounts.get(dev, {})
+                
+                children.append({
+                    'name': part,
+                    'type': 'part',
+                    'size': self._format_size(size_bytes),
+                    'size_bytes': size_bytes,
+                    'mountpoint': mount.get('mountpoint'),
+                    'fstype': mount.get('fstype') or self._udev_property(dev, 'ID_FS_TYPE'),
+                    'uuid': uuids.get(part) or self._udev_property(dev, 'ID_FS_UUID')
+                })
+            
+            size_bytes = int(self._read_sys(os.path.join(disk_dir, 'size')) or 0) * 512
+            devices.append({
+                'name': name,
+                'type': 'disk',
+                'size': self._format_size(size_bytes),
+                'size_bytes': size_bytes,
+                'children': children
+            })
+        
+        return devices
+    
+    def _scan_usage(self, devices):
+        usage_map = {}
+        for device in devices:
+            for child in device['children']:
+                if child['mountpoint']:
+                    usage = self._statvfs_usage(child['mountpoint'])
+                    if usage:
+                        usage_map[f"/dev/{child['name']}"] = usage
+        return usage_map
+    
+    def _read_sys(self, path):
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return ''
+    
+    def _read_mountinfo(self):
+        """Map 'major:minor' -> first mount of that device"""
+        mounts = {}
+        with open(self.mountinfo_file, 'r') as f:
+            for line in f:
+                # id parent major:minor root mountpoint options [optional...] - fstype source super
+                left, _, right = line.partition(' - ')
+                fields = left.split()
+                extra = right.split()
+                if len(fields) < 5 or not extra:
+                    continue
+                dev, root, mountpoint = fields[2], fields[3], fields[4]
+                # btrfs and overlay-style filesystems report an anonymous 0:N device
+                # here; the source (e.g. /dev/sdb1) names the real one
+                if len(extra) > 1 and extra[1].startswith('/dev/'):
+                    dev = self._block_dev_number(extra[1]) or dev
+                # Prefer a whole-filesystem mount over bind mounts of a subdirectory
+                if dev in mounts and (root != '/' or mounts[dev]['root'] == '/'):
+                    continue
+                mounts[dev] = {
+                    'mountpoint': self._unescape_mount(mountpoint),
+                    'root': root,
+                    'fstype': extra[0]
+                }
+        return mounts
+    
+    def _block_dev_number(self, path):
+        """'major:minor' of a block device node, or None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISBLK(st.st_mode):
+            return None
+        return f"{os.major(st.st_rdev)}:{os.minor(st.st_rdev)}"
+    
+    def managed_bases(self):
+        return [self.mount_base, self.mount_base_private, self.mount_base_public]
+    
+    def resolve_managed_path(self, path):
+        """Real path of a user-supplied path, which must lie under a managed mount base"""
+        if not path:
+            raise ValueError('Path required')
+        real = os.path.realpath(path)
+        for base in self.managed_bases():
+            base = os.path.realpath(base)
+            if real == base or real.startswith(base + os.sep):
+                return real
+        raise ValueError('Path is not under a managed mount base')
+    
+    def managed_mounts(self):
+        """Mountpoints of the drives mounted under the managed mount bases"""
+        bases = [os.path.realpath(base) for base in self.managed_bases()]
+        mountpoints = []
+        try:
+            mounts = self._read_mountinfo()
+        except OSError:
+            return mountpoints
+        for info in mounts.values():
+            mountpoint = info['mountpoint']
+            if any(mountpoint == base or mountpoint.startswith(base + os.sep) for base in bases):
+                mountpoints.append(mountpoint)
+        return sorted(mountpoints)
+    
+    def _unescape_mount(self, path):
+        # mountinfo escapes space, tab, newline and backslash as octal
+        return path.replace('\\040', ' ').replace('\\011', '\t').replace('\\012', '\n').replace('\\134', '\\')
+    
+    def _read_uuids(self):
+        """Map partition name -> filesystem UUID from /dev/disk/by-uuid"""
+        uuids = {}
+        try:
+            entries = os.listdir(self.by_uuid_dir)
+        except OSError:
+            return uuids
+        for uuid in entries:
+            try:
+                target = os.readlink(os.path.join(self.by_uuid_dir, uuid))
+            except OSError:
+                continue
+            uuids[os.path.basename(target)] = uuid
+        return uuids
+    
+    def _udev_property(self, dev, key):
+        # udev's database knows the filesystem of partitions that aren't mounted
+        try:
+            with open(os.path.join(self.udev_data_dir, f"b{dev}"), 'r') as f:
+                for line in f:
+                    if line.startswith(f"E:{key}="):
+                        return line.strip().split('=', 1)[1]
+        except OSError:
+            pass
+        return None
+    
+    def _statvfs_usage(self, mountpoint):
+        try:
+            st = os.statvfs(mountpoint)
+        except OSError:
+            return None
+        
+        size = st.f_blocks * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        available = st.f_bavail * st.f_frsize
+        # Same rounding as df: used / (used + available), rounded up
+        usable = used + available
+        percent = -(-used * 100 // usable) if usable else 0
+        
+        return {
+            'size': self._format_size(size),
+            'used': self._format_size(used),
+            'available': self._format_size(available),
+            'percent': f"{percent}%",
+            'mountpoint': mountpoint,
+            'size_bytes': size,
+            'used_bytes': used,
+            'available_bytes': available
+        }
+    
+    def _get_storage_info_lsblk(self):
         # Get all block devices
         cmd = "lsblk -J -o NAME,SIZE,MOUNTPOINT,FSTYPE,UUID,TYPE"
         stdout, stderr, code = self._run_command(cmd)
@@ -102,6 +358,8 @@ class StorageManager:
             'size': device['size'],
             'partitions': []
         }
+        if 'size_bytes' in device:
+            disk['size_bytes'] = device['size_bytes']
         
         for child in device.get('children', []):
             if child['type'] == 'part':
@@ -109,7 +367,10 @@ class StorageManager:
                 device_path = f"/dev/{child['name']}"
                 
                 # Check size - skip if less than 100MB
-                size_mb = self._parse_size_mb(child['size'])
+                if 'size_bytes' in child:
+                    size_mb = child['size_bytes'] / (1024 * 1024)
+                else:
+                    size_mb = self._parse_size_mb(child['size'])
                 if size_mb < 100:
                     continue
                 
@@ -133,11 +394,20 @@ class StorageManager:
                     'is_mounted': bool(child.get('mountpoint')),
                     'usage': usage
                 }
+                if 'size_bytes' in child:
+                    partition['size_bytes'] = child['size_bytes']
                 disk['partitions'].append(partition)
         
         return disk if disk['partitions'] else None
     
-    def mount(self, device, mount_type='normal'):
+    def _progress(self, progress, message):
+        if progress:
+            progress(message)
+    
+    def mount(self, device, mount_type='normal', progress=None):
+        # Runs as a background job (see JobManager), so slow mounts get a long timeout
+        self._progress(progress, f'Checking {device}')
+        
         # Check if already mounted
         check_cmd = f"mount | grep {device}"
         stdout, _, _ = self._run_command(check_cmd)
@@ -165,19 +435,24 @@ class StorageManager:
         os.makedirs(mount_point, exist_ok=True)
         
         # Mount
+        self._progress(progress, f'Mounting {device} at {mount_point}')
         mount_cmd = f"sudo mount {device} {mount_point}"
-        _, stderr, code = self._run_command(mount_cmd)
+        _, stderr, code = self._run_command(mount_cmd, timeout=self.mount_timeout)
         
         if code != 0:
             return {'success': False, 'error': f'Mount failed: {stderr}'}
         
         # Set permissions for public mounts
         if mount_type == 'public':
+            self._progress(progress, 'Setting public permissions')
             self._run_command(f"sudo chmod 777 {mount_point}")
         
+        self.invalidate()
         return {'success': True, 'mountpoint': mount_point}
     
-    def unmount(self, device):
+    def unmount(self, device, progress=None):
+        self._progress(progress, f'Checking {device}')
+        
         # Get mountpoint
         check_cmd = f"mount | grep {device}"
         stdout, _, _ = self._run_command(check_cmd)
@@ -187,18 +462,22 @@ class StorageManager:
         # Extract mountpoint
         mountpoint = stdout.split()[2]
         
-        # Unmount
+        # Unmount (flushing a large write cache can take a while)
+        self._progress(progress, f'Unmounting {mountpoint}')
         unmount_cmd = f"sudo umount {device}"
-        _, stderr, code = self._run_command(unmount_cmd)
+        _, stderr, code = self._run_command(unmount_cmd, timeout=self.mount_timeout)
         
         if code != 0:
             return {'success': False, 'error': f'Unmount failed: {stderr}'}
         
+        self.invalidate()
+        
         # Clean up: Remove the mount directory if it's in our managed paths
         managed_paths = [self.mount_base, self.mount_base_private, self.mount_base_public]
         should_cleanup = any(mountpoint.startswith(path) for path in managed_paths)
         
         if should_cleanup:
+            self._progress(progress, f'Removing {mountpoint}')
             try:
                 # Check if directory is empty before removing
                 if os.path.exists(mountpoint) and os.path.isdir(mountpoint):
@@ -0,0 +1,179 @@
+import errno
+import os
+import queue
+import select
+import socket
+import threading
+import time
+
+NETLINK_KOBJECT_UEVENT = 15
+
+class StorageWatcher:
+    """Invalidates the StorageManager cache when storage actually changes.
+
+    Two event sources, both waited on with one poll() in a single thread:
+    - /proc/self/mountinfo signals POLLPRI whenever the mount table changes
+    - a netlink uevent socket reports block devices being added or removed
+
+    Connected clients subscribe to receive those events as they happen.
+    """
+
+    def __init__(self, storage_mgr, settle_delay=1.5):
+        self.storage_mgr = storage_mgr
+        # udev creates by-uuid links and its database entry shortly after the
+        # kernel uevent, so hotplug refreshes are repeated once it has settled
+        self.settle_delay = settle_delay
+
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = []              # (due time, event) to re-announce after settling
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._watch, name='storage-watcher', daemon=True)
+            self._thread.start()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=32)
+        with self._lock:
+            self._subscribers[id(q)] = q
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(id(q), None)
+
+    def _publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass  # a stalled client just misses events; it can refresh
+
+    def _open_sources(self):
+        poller = select.poll()
+        sources = {}
+
+        try:
+            mountinfo = open(self.storage_mgr.mountinfo_file, 'rb')
+            mountinfo.read()  # reading arms the change notification
+            poller.register(mountinfo.fileno(), select.POLLPRI | select.POLLERR)
+            sources[mountinfo.fileno()] = ('mountinfo', mountinfo)
+        except OSError as e:
+            print(f"Warning: cannot watch mount table: {e}")
+
+        try:
+            uevents = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            uevents.bind((0, 1))  # group 1: kernel uevents
+            poller.register(uevents.fileno(), select.POLLIN)
+            sources[uevents.fileno()] = ('uevent', uevents)
+        except (OSError, AttributeError) as e:
+            print(f"Warning: cannot watch block device hotplug: {e}")
+
+        return poller, sources
+
+    def _watch(self):
+        poller, sources = self._open_sources()
+        if not sources:
+            return  # StorageManager keeps its TTL-based cache
+
+        # Events will tell us when to rescan, so the topology can live forever.
+        # Without uevents a disk that is plugged in but not mounted goes
+        # unnoticed, so keep the TTL as the fallback for that case.
+        previous_ttl = self.storage_mgr.topology_ttl
+        if any(kind == 'uevent' for kind, _ in sources.values()):
+            self.storage_mgr.topology_ttl = None
+
+        try:
+            while True:
+                timeout = None
+                if self._pending:
+                    timeout = max(self._pending[0][0] - time.monotonic(), 0) * 1000
+
+                for fd, _ in poller.poll(timeout):
+                    kind, source = sources[fd]
+                    if kind == 'mountinfo':
+                        source.seek(0)
+                        source.read()
+                        self.storage_mgr.invalidate()
+                        self._publish({'type': 'mounts-changed'})
+                        continue
+                    try:
+                        data = source.recv(8192)
+                    except OSError as e:
+                        if e.errno != errno.ENOBUFS:
+                            raise
+                        # The kernel dropped uevents (e.g. a burst at boot): rescan anyway
+                        self.storage_mgr.invalidate()
+                        self._publish({'type': 'device-changed', 'device': '', 'devtype': ''})
+                        continue
+                    self._handle_uevent(data)
+
+                now = time.monotonic()
+                while self._pending and self._pending[0][0] <= now:
+                    _, event = self._pending.pop(0)
+                    self.storage_mgr.invalidate()
+                    self._publish(event)
+        except Exception as e:
+            print(f"Warning: storage watcher stopped: {e}")
+        finally:
+            # Nothing invalidates the cache any more, so let it expire again
+            self.storage_mgr.topology_ttl = previous_ttl
+            self.storage_mgr.invalidate()
+            for _, source in sources.values():
+                source.close()
+
+    def _handle_uevent(self, data):
+        # "ACTION@devpath\0KEY=VALUE\0KEY=VALUE..."
+        parts = data.split(b'\0')
+        props = {}
+        for part in parts[1:]:
+            key, sep, value = part.partition(b'=')
+            if sep:
+                props[key.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+
+        if props.get('SUBSYSTEM') != 'block':
+            return
+        action = props.get('ACTION')
+        if action not in ('add', 'remove', 'change'):
+            return
+
+        self.storage_mgr.invalidate()
+
+        devname = props.get('DEVNAME', '')
+        if devname and not devname.startswith('/dev/'):
+            devname = f'/dev/{devname}'
+        if devname.startswith(('/dev/loop', '/dev/ram', '/dev/zram', '/dev/dm-')):
+            return
+
+        event = {
+            'type': 'device-added' if action == 'add' else 'device-removed' if action == 'remove' else 'device-changed',
+            'device': devname,
+            'devtype': props.get('DEVTYPE', '')
+        }
+        self._publish(event)
+        if action in ('add', 'change'):
+            self._pending.append((time.monotonic() + self.settle_delay, dict(event, settled=True)))
+
+
+# Standalone test
+if __name__ == '__main__':
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from modules.storage import StorageManager
+
+    print("Testing StorageWatcher (plug in a drive or mount something, Ctrl+C to stop)...")
+    watcher = StorageWatcher(StorageManager())
+    events = watcher.subscribe()
+    watcher.start()
+
+    try:
+        while True:
+            print(events.get())
+    except KeyboardInterrupt:
+        pass
@@ -1,8 +1,39 @@
 import subprocess
+import threading
 import psutil
+import time
 import os
 
+try:
+    from modules.history import MetricsHistory
+    from modules.sensors import TemperatureSensors
+except ImportError:  # standalone test: python3 modules/system.py
+    from history import MetricsHistory
+    from sensors import TemperatureSensors
+
 class SystemManager:
+    def __init__(self, sample_interval=1.0):
+        # Stats are sampled by a background thread so requests never block
+        self.sample_interval = sample_interval
+        self._snapshot = None
+        self._sampler = None
+        self._sampler_lock = threading.Lock()
+        self._sample_lock = threading.Lock()      # one _take_sample at a time (_last_io, history)
+        self._first_sample = threading.Event()
+        self._last_io = None
+        self._block_devices = set()
+        self._stacked_devices = set()   # dm-*/md* built on other disks (have slaves/)
+        self._seen_devices = set()
+        
+        # Temperature sources are probed once; subprocess fallback is rate limited
+        self.sensors = TemperatureSensors()
+        self._fallback_temp = None
+        self._fallback_checked = 0
+        self.fallback_interval = 30
+        
+        # Bounded trend history fed by the sampler
+        self.history = MetricsHistory()
+    
     def _run_command(self, cmd):
         try:
             result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=5)
@@ -10,46 +41,202 @@ class SystemManager:
         except subprocess.TimeoutExpired:
             return '', 'Command timeout', 1
     
-    def get_stats(self):
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1, percpu=False)
+    def start_sampler(self):
+        """Start the background sampler thread (safe to call more than once)"""
+        with self._sampler_lock:
+            if self._sampler and self._sampler.is_alive():
+                return
+            
+            # Prime the CPU counters so the first sample covers a real interval
+            psutil.cpu_percent(interval=None)
+            psutil.cpu_percent(interval=None, percpu=True)
+            
+            self._sampler = threading.Thread(target=self._sample_loop, name='stats-sampler', daemon=True)
+            self._sampler.start()
+    
+    def _sample_loop(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self._take_sample()
+            except Exception as e:
+                print(f"Warning: stats sample failed: {e}")
+            
+            elapsed = time.monotonic() - started
+            time.sleep(max(self.sample_interval - elapsed, 0.05))
+    
+    def _take_sample(self):
+        with self._sample_lock:
+            snapshot = self._sample()
+        self._first_sample.set()
+        return snapshot
+    
+    def _sample(self):
+        # CPU usage since the previous sample (non-blocking)
+        cpu_percent = psutil.cpu_percent(interval=None, percpu=False)
+        cpu_per_core = psutil.cpu_percent(interval=None, percpu=True)
         
-        # CPU temperature
-        temp = self._get_cpu_temperature()
+        # CPU temperature (plus every other discovered sensor)
+        temperatures = self.sensors.read_all()
+        temp = self._get_cpu_temperature(temperatures)
         
         # Memory usage
         mem = psutil.virtual_memory()
         
-        return {
+        # Disk and network throughput from counter deltas between ticks
+        disk_io, net_io, per_disk, per_nic = self._io_rates()
+        
+        snapshot = {
             'cpu_percent': cpu_percent,
+            'cpu_per_core': cpu_per_core,
             'cpu_temp': temp,
+            'temperatures': temperatures,
             'memory': {
                 'total': self._bytes_to_gb(mem.total),
                 'used': self._bytes_to_gb(mem.used),
                 'available': self._bytes_to_gb(mem.available),
-                'percent': mem.percent
-            }
+                'percent': mem.percent,
+                'total_bytes': mem.total,
+                'used_bytes': mem.used,
+                'available_bytes': mem.available
+            },
+            'disk_io': disk_io,
+            'network': net_io,
+            'disks': per_disk,
+            'nics': per_nic,
+            'sampled_at': time.time(),
+            '_monotonic': time.monotonic()
         }
+        
+        # Replacing the reference is atomic, readers always see a full sample
+        self._snapshot = snapshot
+        
+        self.history.record(snapshot['sampled_at'], {
+            'cpu': cpu_percent,
+            'memory': mem.percent,
+            'temperature': temp,
+            'disk_read': disk_io['read_bytes_per_sec'],
+            'disk_write': disk_io['write_bytes_per_sec'],
+            'net_rx': net_io['rx_bytes_per_sec'],
+            'net_tx': net_io['tx_bytes_per_sec']
+        })
+        return snapshot
     
-    def _get_cpu_temperature(self):
-        # Try different methods to get CPU temperature
-        
-        # Method 1: thermal zone (most common)
-        thermal_files = [
-            '/sys/class/thermal/thermal_zone0/temp',
-            '/sys/class/thermal/thermal_zone1/temp'
-        ]
-        
-        for thermal_file in thermal_files:
-            if os.path.exists(thermal_file):
-                try:
-                    with open(thermal_file, 'r') as f:
-                        temp = float(f.read().strip()) / 1000.0
-                        if 0 < temp < 150:  # Sanity check
-                            return round(temp, 1)
-                except:
-                    pass
+    def _io_rates(self):
+        now = time.monotonic()
+        disks = self._whole_disk_counters(psutil.disk_io_counters(perdisk=True) or {})
+        nics = psutil.net_io_counters(pernic=True) or {}
+        nics.pop('lo', None)
+        
+        per_disk = []
+        per_nic = []
+        disk_io = {'read_bytes_per_sec': None, 'write_bytes_per_sec': None}
+        net_io = {'rx_bytes_per_sec': None, 'tx_bytes_per_sec': None}
+        
+        elapsed = now - self._last_io[0] if self._last_io else 0
+        if elapsed > 0:
+            _, last_disks, last_nics = self._last_io
+            
+            for name in sorted(disks):
+                last = last_disks.get(name)
+                if last is None:
+                    continue  # hotplugged since the previous tick
+                cur = disks[name]
+                disk = {
+                    'name': name,
+                    'read_bytes_per_sec': self._rate(cur.read_bytes, last.read_bytes, elapsed),
+                    'write_bytes_per_sec': self._rate(cur.write_bytes, last.write_bytes, elapsed),
+                    'read_iops': self._rate(cur.read_count, last.read_count, elapsed),
+                    'write_iops': self._rate(cur.write_count, last.write_count, elapsed),
+                    'stacked': name in self._stacked_devices
+                }
+                if hasattr(cur, 'busy_time'):
+                    # busy_time is in ms; 1000ms busy per second == 100%
+                    busy = self._rate(cur.busy_time, last.busy_time, elapsed) / 10.0
+                    disk['busy_percent'] = round(min(busy, 100.0), 1)
+                per_disk.append(disk)
+            
+            for name in sorted(nics):
+                last = last_nics.get(name)
+                if last is None:
+                    continue
+                cur = nics[name]
+                per_nic.append({
+                    'name': name,
+                    'rx_bytes_per_sec': self._rate(cur.bytes_recv, last.bytes_recv, elapsed),
+                    'tx_bytes_per_sec': self._rate(cur.bytes_sent, last.bytes_sent, elapsed),
+                    'rx_packets_per_sec': self._rate(cur.packets_recv, last.packets_recv, elapsed),
+                    'tx_packets_per_sec': self._rate(cur.packets_sent, last.packets_sent, elapsed)
+                })
+            
+            # LVM/LUKS/RAID I/O is already counted on the member disks
+            physical = [d for d in per_disk if not d['stacked']]
+            disk_io['read_bytes_per_sec'] = round(sum(d['read_bytes_per_sec'] for d in physical), 1)
+            disk_io['write_bytes_per_sec'] = round(sum(d['write_bytes_per_sec'] for d in physical), 1)
+            net_io['rx_bytes_per_sec'] = round(sum(n['rx_bytes_per_sec'] for n in per_nic), 1)
+            net_io['tx_bytes_per_sec'] = round(sum(n['tx_bytes_per_sec'] for n in per_nic), 1)
         
+        # Keep only the raw counters; the next tick diffs against them
+        self._last_io = (now, disks, nics)
+        return disk_io, net_io, per_disk, per_nic
+    
+    def _whole_disk_counters(self, counters):
+        # perdisk also lists partitions; counting sda and sda1 would double the totals
+        # /sys/block is only re-read when a device name we haven't seen shows up
+        if not self._seen_devices.issuperset(counters):
+            self._seen_devices.update(counters)
+            try:
+                self._block_devices = set(os.listdir('/sys/block'))
+            except OSError:
+                return counters
+            self._stacked_devices = {name for name in self._block_devices if self._has_slaves(name)}
+        
+        return {name: c for name, c in counters.items()
+                if name in self._block_devices and not name.startswith(('loop', 'ram', 'zram'))}
+    
+    def _has_slaves(self, name):
+        try:
+            return bool(os.listdir(f'/sys/block/{name}/slaves'))
+        except OSError:
+            return False
+    
+    def _rate(self, current, previous, elapsed):
+        # Counters can reset (device removed, wrap) - report 0 rather than negative
+        return round(max(current - previous, 0) / elapsed, 1)
+    
+    def get_history(self, metric, range_seconds=600, step=1):
+        return self.history.query(metric, range_seconds, step)
+    
+    def get_stats(self):
+        snapshot = self._snapshot
+        if snapshot is None and self._sampler and self._sampler.is_alive():
+            # Cold start: wait for the sampler's first tick rather than racing it
+            self._first_sample.wait(self.sample_interval + 2)
+            snapshot = self._snapshot
+        if snapshot is None:
+            # Sampler not running - take one sample over a short window
+            self._take_sample()
+            time.sleep(0.1)
+            snapshot = self._take_sample()
+        
+        stats = {k: v for k, v in snapshot.items() if not k.startswith('_')}
+        stats['sample_age'] = round(time.monotonic() - snapshot['_monotonic'], 3)
+        return stats
+    
+    def _get_cpu_temperature(self, readings):
+        # Method 1: sensors discovered in sysfs at startup (no forks)
+        if self.sensors.available:
+            return self.sensors.cpu_temperature(readings)
+        
+        # Nothing in sysfs - only then shell out, and not on every sample
+        now = time.monotonic()
+        if self._fallback_checked and now - self._fallback_checked < self.fallback_interval:
+            return self._fallback_temp
+        self._fallback_checked = now
+        self._fallback_temp = self._get_fallback_temperature()
+        return self._fallback_temp
+    
+    def _get_fallback_temperature(self):
         # Method 2: sensors command
         stdout, _, code = self._run_command("sensors -u 2>/dev/null | grep '_input' | head -1")
         if code == 0 and stdout:
@@ -92,8 +279,18 @@ class SystemManager:
 if __name__ == '__main__':
     print("Testing SystemManager...")
     sm = SystemManager()
+    sm.start_sampler()
+    time.sleep(1.5)
     
     stats = sm.get_stats()
     print(f"CPU: {stats['cpu_percent']}%")
     print(f"Temperature: {stats['cpu_temp']}°C" if stats['cpu_temp'] else "Temperature: N/A")
-    print(f"Memory: {stats['memory']['used']}GB / {stats['memory']['total']}GB ({stats['memory']['percent']}%)")
\ No newline at end of file
+    print(f"Memory: {stats['memory']['used']}GB / {stats['memory']['total']}GB ({stats['memory']['percent']}%)")
+    print(f"Per core: {stats['cpu_per_core']}")
+    for disk in stats['disks']:
+        print(f"  - {disk['name']}: read {disk['read_bytes_per_sec']}B/s, write {disk['write_bytes_per_sec']}B/s")
+    for nic in stats['nics']:
+        print(f"  - {nic['name']}: rx {nic['rx_bytes_per_sec']}B/s, tx {nic['tx_bytes_per_sec']}B/s")
+    for sensor in stats['temperatures']:
+        print(f"  - {sensor['chip']} {sensor['label']}: {sensor['temp']}°C")
+    print(f"Sample age: {stats['sample_age']}s")
\ No newline at end of file
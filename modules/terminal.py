@@ -1,11 +1,17 @@
-import subprocess
 import configparser
 import os
 
+try:
+    from modules.tmux_client import TmuxClient
+except ImportError:  # standalone test: python3 modules/terminal.py
+    from tmux_client import TmuxClient
+
 class TerminalManager:
-    def __init__(self, config_file='config/settings.ini'):
+    def __init__(self, config_file='config/settings.ini', tmux=None):
         self.config_file = config_file
         self.max_sessions = self._load_max_sessions()
+        # Shared control-mode connection; tmux subprocesses only as a fallback
+        self.tmux = tmux or TmuxClient()
     
     def _load_max_sessions(self):
         if not os.path.exists(self.config_file):
@@ -20,13 +26,6 @@ class TerminalManager:
         config.read(self.config_file)
         return int(config.get('terminal', 'max_sessions_per_user', fallback='3'))
     
-    def _run_command(self, cmd):
-        try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10)
-            return result.stdout.strip(), result.stderr.strip(), result.returncode
-        except subprocess.TimeoutExpired:
-            return '', 'Command timeout', 1
-    
     def _get_session_name(self, username, index):
         return f"cockpit_{username}_{index}"
     
@@ -34,11 +33,10 @@ class TerminalManager:
         # Check which tmux sessions exist for this user
         sessions = []
         
-        # Get all tmux sessions
-        stdout, _, code = self._run_command("tmux list-sessions -F '#{session_name}' 2>/dev/null")
+        # Get all tmux sessions (cached by the control connection)
+        all_sessions = self.tmux.list_sessions()
         
-        if code == 0 and stdout:
-            all_sessions = stdout.split('\n')
+        if all_sessions:
             prefix = f"cockpit_{username}_"
             
             for session in all_sessions:
@@ -74,8 +72,7 @@ class TerminalManager:
         session_name = self._get_session_name(username, next_index)
         
         # Create tmux session in detached mode
-        cmd = f"tmux new-session -d -s {session_name}"
-        _, stderr, code = self._run_command(cmd)
+        _, stderr, code = self.tmux.run(['new-session', '-d', '-s', session_name])
         
         if code != 0:
             return {'success': False, 'error': f'Failed to create session: {stderr}'}
@@ -93,8 +90,7 @@ class TerminalManager:
             return {'success': False, 'error': 'Invalid session name'}
         
         # Kill tmux session
-        cmd = f"tmux kill-session -t {session_name}"
-        _, stderr, code = self._run_command(cmd)
+        _, stderr, code = self.tmux.run(['kill-session', '-t', session_name])
         
         if code != 0:
             return {'success': False, 'error': f'Failed to delete session: {stderr}'}
@@ -103,10 +99,7 @@ class TerminalManager:
     
     def get_attach_command(self, session_name):
         # Check if session exists
-        cmd = f"tmux has-session -t {session_name} 2>/dev/null"
-        _, _, code = self._run_command(cmd)
-        
-        if code != 0:
+        if not self.tmux.has_session(session_name):
             return {'success': False, 'error': 'Session does not exist'}
         
         attach_cmd = f"tmux attach-session -t {session_name}"
@@ -121,10 +114,7 @@ class TerminalManager:
     def get_shell_command(self, session_name):
         """Get command to run shell in tmux session"""
         # Check if session exists
-        cmd = f"tmux has-session -t {session_name} 2>/dev/null"
-        _, _, code = self._run_command(cmd)
-        
-        if code != 0:
+        if not self.tmux.has_session(session_name):
             return {'success': False, 'error': 'Session does not exist'}
         
         # Send a command to the tmux session
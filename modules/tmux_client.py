@@ -0,0 +1,214 @@
+import shlex
+import subprocess
+import threading
+import time
+from collections import deque
+
+class TmuxClient:
+    """tmux commands over one persistent control-mode (`tmux -C`) connection.
+
+    The connection is attached to a small hidden session (CONTROL_SESSION)
+    and commands are written to it one line each; tmux answers them in order
+    with %begin/%end (or %error) blocks, so no process is started per call.
+    The session list is cached and refreshed after %sessions-changed.
+
+    If control mode cannot be started, or the connection drops, run() falls
+    back to one `tmux` subprocess per call (no shell), retrying control mode
+    every RETRY_INTERVAL seconds.
+    """
+
+    CONTROL_SESSION = 'cockpit-control'
+    RETRY_INTERVAL = 30
+    MUTATING = ('new-session', 'kill-session', 'rename-session', 'kill-server')
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._proc = None
+        self._ready = threading.Event()
+        self._pending = deque()         # waiters for our commands, in the order sent
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._next_attempt = 0
+
+        self._sessions = None           # cached session names; None = stale
+        self._generation = 0            # bumped whenever the cache goes stale
+        self._cache_lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self._proc is not None and self._proc.poll() is None and self._ready.is_set()
+
+    # ---------- control connection ----------
+
+    def start(self):
+        """Open the control-mode connection; False if tmux or control mode is unavailable"""
+        with self._start_lock:
+            if self.connected:
+                return True
+            self._ready.clear()
+            try:
+                # -A: reuse the helper session left by a previous run; it only runs cat
+                proc = subprocess.Popen(
+                    ['tmux', '-C', 'new-session', '-A', '-s', self.CONTROL_SESSION, 'cat'],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            except OSError:
+                self._next_attempt = time.monotonic() + self.RETRY_INTERVAL
+                return False
+            self._proc = proc
+            self._invalidate()
+            threading.Thread(target=self._read_loop, args=(proc,), name='tmux-control', daemon=True).start()
+
+            if not self._ready.wait(self.timeout) or proc.poll() is not None:
+                proc.kill()
+                self._proc = None
+                self._next_attempt = time.monotonic() + self.RETRY_INTERVAL
+                return False
+            return True
+
+    def _ensure(self):
+        if self.connected:
+            return True
+        if time.monotonic() < self._next_attempt:
+            return False
+        return self.start()
+
+    def _read_loop(self, proc):
+        block = None
+        try:
+            for raw in proc.stdout:
+                line = raw.decode('utf-8', errors='replace').rstrip('\n')
+                if block is not None:
+                    # Output lines are raw, so only a matching %end/%error closes the block
+                    fields = line.split(' ')
+                    if fields[0] in ('%end', '%error') and fields[1:3] == block['id']:
+                        self._finish(block, ok=fields[0] == '%end')
+                        block = None
+                    else:
+                        block['lines'].append(line)
+                elif line.startswith('%begin '):
+                    fields = line.split(' ')
+                    block = {'id': fields[1:3], 'ours': fields[3:4] == ['1'], 'lines': []}
+                elif line.startswith(('%sessions-changed', '%session-renamed')):
+                    self._invalidate()
+                elif line.startswith('%exit'):
+                    break
+        except (OSError, ValueError):
+            pass
+        finally:
+            # Connection gone: whatever is still waiting goes through subprocess instead
+            self._ready.clear()
+            self._invalidate()
+            while self._pending:
+                self._pending.popleft()['event'].set()
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.wait()
+            self._next_attempt = 0
+
+    def _finish(self, block, ok):
+        if not block['ours']:
+            self._ready.set()   # the attach itself: control mode is up
+            return
+        if self._pending:
+            waiter = self._pending.popleft()
+            waiter['lines'] = block['lines']
+            waiter['ok'] = ok
+            waiter['event'].set()
+
+    def _command(self, args):
+        """Send one command over the control connection; None if the connection failed"""
+        line = ' '.join(shlex.quote(str(arg)) for arg in args)
+        if '\n' in line:
+            raise ValueError('tmux arguments cannot contain newlines')
+
+        waiter = {'event': threading.Event(), 'lines': None, 'ok': False}
+        try:
+            with self._write_lock:
+                # Queue and write together so replies match waiters in order
+                self._pending.append(waiter)
+                self._proc.stdin.write(line.encode('utf-8') + b'\n')
+                self._proc.stdin.flush()
+        except (OSError, AttributeError, ValueError):
+            return None
+
+        if not waiter['event'].wait(self.timeout):
+            return '', 'Command timeout', 1
+        if waiter['lines'] is None:
+            return None     # connection closed before the reply
+        output = '\n'.join(waiter['lines'])
+        if waiter['ok']:
+            return output.rstrip('\n'), '', 0
+        return '', output.strip(), 1
+
+    def _subprocess(self, args):
+        try:
+            result = subprocess.run(['tmux'] + [str(arg) for arg in args],
+                                    capture_output=True, text=True, errors='replace', timeout=self.timeout)
+            # Only trailing newlines: leading blank lines matter to capture-pane
+            return result.stdout.rstrip('\n'), result.stderr.strip(), result.returncode
+        except FileNotFoundError:
+            return '', 'tmux not found', 127
+        except subprocess.TimeoutExpired:
+            return '', 'Command timeout', 1
+
+    # ---------- commands ----------
+
+    def run(self, args):
+        """Run a tmux command given as an argument list; returns (stdout, stderr, returncode)"""
+        result = self._command(args) if self._ensure() else None
+        if result is None:
+            result = self._subprocess(args)
+        if args and args[0] in self.MUTATING:
+            # Don't wait for %sessions-changed: the next list must see this change
+            self._invalidate()
+        return result
+
+    def _invalidate(self):
+        with self._cache_lock:
+            self._sessions = None
+            self._generation += 1
+
+    def list_sessions(self):
+        """Names of all tmux sessions (cached while the control connection is up)"""
+        with self._cache_lock:
+            if self._sessions is not None and self.connected:
+                return list(self._sessions)
+            generation = self._generation
+
+        stdout, _, code = self.run(['list-sessions', '-F', '#{session_name}'])
+        # Non-zero usually means no server is running, i.e. no sessions
+        names = [name for name in stdout.split('\n') if name and name != self.CONTROL_SESSION] if code == 0 else []
+
+        with self._cache_lock:
+            if self.connected and generation == self._generation:
+                self._sessions = names
+        return list(names)
+
+    def has_session(self, name):
+        return name in self.list_sessions()
+
+
+# Standalone test
+if __name__ == '__main__':
+    print("Testing TmuxClient...")
+    tmux = TmuxClient()
+    print(f"  control mode: {tmux.start()}")
+
+    started = time.perf_counter()
+    for _ in range(100):
+        tmux.list_sessions()
+    print(f"  cached list_sessions: {(time.perf_counter() - started) * 10:.3f}ms")
+
+    print(f"  create: {tmux.run(['new-session', '-d', '-s', 'tmux_client_test'])}")
+    print(f"  has_session: {tmux.has_session('tmux_client_test')}")
+    print(f"  display-message: {tmux.run(['display-message', '-p', '-t', 'tmux_client_test', '#{session_name}'])}")
+    print(f"  kill: {tmux.run(['kill-session', '-t', 'tmux_client_test'])}")
+    print(f"  has_session after kill: {tmux.has_session('tmux_client_test')}")
+    print(f"  error: {tmux.run(['has-session', '-t', 'tmux_client_test'])}")
+
+    started = time.perf_counter()
+    for _ in range(100):
+        tmux._subprocess(['list-sessions', '-F', '#{session_name}'])
+    print(f"  subprocess list-sessions: {(time.perf_counter() - started) * 10:.3f}ms")
@@ -178,6 +178,16 @@ async function refreshStorage() {
     }
 }
 
+// Mount/unmount run as background jobs; poll until the job finishes
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}?wait=25`);
+        const job = await response.json();
+        if (!response.ok) throw new Error(job.error || 'Job lookup failed');
+        if (job.finished_at) return job;
+    }
+}
+
 async function mountPartition(device, type) {
     try {
         const response = await fetch('/api/storage/mount', {
@@ -188,12 +198,20 @@ async function mountPartition(device, type) {
         
         const data = await response.json();
         
-        if (response.ok) {
-            showToast(`Mounted ${device} at ${data.mountpoint}`);
-            refreshStorage();
-        } else {
+        if (!response.ok) {
             showToast(data.error || 'Mount failed', true);
+            return;
         }
+        
+        showToast(`Mounting ${device}...`);
+        const job = await waitForJob(data.job_id);
+        
+        if (job.status === 'succeeded') {
+            showToast(`Mounted ${device} at ${job.result.mountpoint}`);
+        } else {
+            showToast((job.result && job.result.error) || 'Mount failed', true);
+        }
+        refreshStorage();
     } catch (error) {
         showToast('Network error: ' + error.message, true);
     }
@@ -211,12 +229,20 @@ async function unmountPartition(device) {
         
         const data = await response.json();
         
-        if (response.ok) {
+        if (!response.ok) {
+            showToast(data.error || 'Unmount failed', true);
+            return;
+        }
+        
+        showToast(`Unmounting ${device}...`);
+        const job = await waitForJob(data.job_id);
+        
+        if (job.status === 'succeeded') {
             showToast(`Unmounted ${device}`);
-            refreshStorage();
         } else {
-            showToast(data.error || 'Unmount failed', true);
+            showToast((job.result && job.result.error) || 'Unmount failed', true);
         }
+        refreshStorage();
     } catch (error) {
         showToast('Network error: ' + error.message, true);
     }
@@ -291,9 +317,142 @@ async function refreshSystemStats() {
     }
 }
 
+// Terminal transport: one WebSocket per terminal view carrying binary
+// frames (type uint8, length uint32 BE, payload); SSE + POST routes are the fallback
+const PTY_OUTPUT = 0x00;
+const PTY_INPUT = 0x00;
+const PTY_RESIZE = 0x01;
+const ptyEncoder = new TextEncoder();
+
+function packPtyFrame(type, payload) {
+    const frame = new Uint8Array(5 + payload.length);
+    const view = new DataView(frame.buffer);
+    view.setUint8(0, type);
+    view.setUint32(1, payload.length);
+    frame.set(payload, 5);
+    return frame;
+}
+
+function forEachPtyFrame(buffer, callback) {
+    const view = new DataView(buffer);
+    let offset = 0;
+    while (offset + 5 <= buffer.byteLength) {
+        const type = view.getUint8(offset);
+        const length = view.getUint32(offset + 1);
+        callback(type, new Uint8Array(buffer, offset + 5, length));
+        offset += 5 + length;
+    }
+}
+
+function connectPty(kind, terminalId, term, onLost) {
+    const conn = {ws: null, eventSource: null, closed: false};
+    let opened = false;
+    let pendingResize = null;
+    
+    function useFallback() {
+        conn.eventSource = new EventSource(`/api/${kind}/read/${terminalId}`);
+        
+        conn.eventSource.onmessage = function(event) {
+            const data = JSON.parse(event.data);
+            if (data.output) {
+                term.write(data.output);
+            }
+        };
+        
+        conn.eventSource.onerror = function() {
+            if (conn.closed) return;
+            conn.close();
+            onLost();
+        };
+        
+        if (pendingResize) {
+            conn.resize(pendingResize.rows, pendingResize.cols);
+        }
+    }
+    
+    conn.send = function(data) {
+        if (opened && conn.ws.readyState === WebSocket.OPEN) {
+            conn.ws.send(packPtyFrame(PTY_INPUT, ptyEncoder.encode(data)));
+        } else if (conn.eventSource) {
+            fetch(`/api/${kind}/write/${terminalId}`, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({data: data})
+            });
+        }
+    };
+    
+    conn.resize = function(rows, cols) {
+        if (opened && conn.ws.readyState === WebSocket.OPEN) {
+            const size = new DataView(new ArrayBuffer(4));
+            size.setUint16(0, rows);
+            size.setUint16(2, cols);
+            conn.ws.send(packPtyFrame(PTY_RESIZE, new Uint8Array(size.buffer)));
+        } else if (conn.eventSource) {
+            fetch(`/api/${kind}/resize/${terminalId}`, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({rows: rows, cols: cols})
+            });
+        } else {
+            pendingResize = {rows, cols};
+        }
+    };
+    
+    conn.close = function() {
+        conn.closed = true;
+        if (conn.ws) {
+            conn.ws.close();
+        }
+        if (conn.eventSource) {
+            conn.eventSource.close();
+        }
+    };
+    
+    const protocol = location.protocol === 'https:' ? 'wss:' : 'ws:';
+    try {
+        conn.ws = new WebSocket(`${protocol}//${location.host}/ws/${kind}/${terminalId}`);
+    } catch (error) {
+        useFallback();
+        return conn;
+    }
+    conn.ws.binaryType = 'arraybuffer';
+    
+    conn.ws.onopen = function() {
+        opened = true;
+        if (pendingResize) {
+            conn.resize(pendingResize.rows, pendingResize.cols);
+        }
+    };
+    
+    conn.ws.onmessage = function(event) {
+        if (typeof event.data === 'string') return;
+        forEachPtyFrame(event.data, function(type, payload) {
+            if (type === PTY_OUTPUT) {
+                // xterm decodes UTF-8 itself, across frame boundaries
+                term.write(payload);
+            }
+        });
+    };
+    
+    conn.ws.onclose = function() {
+        if (conn.closed) return;
+        if (!opened) {
+            // WebSockets blocked (proxy, old server) - use SSE + POST instead
+            conn.ws = null;
+            useFallback();
+        } else {
+            conn.closed = true;
+            onLost();
+        }
+    };
+    
+    return conn;
+}
+
 let htopTerminal = null;
 let htopTerminalId = null;
-let htopEventSource = null;
+let htopConnection = null;
 
 function startHtop() {
     const container = document.getElementById('htopContainer');
@@ -332,39 +491,21 @@ function startHtop() {
         
         htopTerminalId = data.terminal_id;
         
+        htopConnection = connectPty('htop', htopTerminalId, htopTerminal, function() {
+            showToast('Htop connection lost', true);
+            stopHtop();
+        });
+        
         // Handle terminal input (for navigation in htop)
         htopTerminal.onData(function(data) {
-            fetch(`/api/htop/write/${htopTerminalId}`, {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({data: data})
-            });
+            htopConnection.send(data);
         });
         
         // Handle resize
         htopTerminal.onResize(function(size) {
-            fetch(`/api/htop/resize/${htopTerminalId}`, {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({rows: size.rows, cols: size.cols})
-            });
+            htopConnection.resize(size.rows, size.cols);
         });
         
-        // Connect to output stream
-        htopEventSource = new EventSource(`/api/htop/read/${htopTerminalId}`);
-        
-        htopEventSource.onmessage = function(event) {
-            const data = JSON.parse(event.data);
-            if (data.output) {
-                htopTerminal.write(data.output);
-            }
-        };
-        
-        htopEventSource.onerror = function() {
-            showToast('Htop connection lost', true);
-            stopHtop();
-        };
-        
         htopTerminal.focus();
         toggleText.textContent = '⏸ Stop';
     })
@@ -376,10 +517,10 @@ function startHtop() {
 function stopHtop() {
     const toggleText = document.getElementById('htopToggleText');
     
-    // Close event source
-    if (htopEventSource) {
-        htopEventSource.close();
-        htopEventSource = null;
+    // Close the output stream
+    if (htopConnection) {
+        htopConnection.close();
+        htopConnection = null;
     }
     
     // Stop htop session
@@ -426,6 +567,11 @@ showPage = function(pageName) {
         stopHtop();
     }
     
+    // Stop storage events when leaving storage page
+    if (pageName !== 'storage') {
+        stopStorageEvents();
+    }
+    
     // Call original function
     originalShowPage.call(this, pageName);
 };
@@ -496,7 +642,7 @@ async function createSession() {
 
 let currentTerminal = null;
 let currentTerminalId = null;
-let terminalEventSource = null;
+let terminalConnection = null;
 
 async function useSession(sessionName) {
     try {
@@ -570,48 +716,24 @@ async function useSession(sessionName) {
         
         currentTerminalId = data.terminal_id;
         
-        // Send initial resize to match terminal size
-        const cols = currentTerminal.cols;
-        const rows = currentTerminal.rows;
-        fetch(`/api/terminal/resize/${currentTerminalId}`, {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({rows: rows, cols: cols})
+        terminalConnection = connectPty('terminal', currentTerminalId, currentTerminal, function() {
+            showToast('Terminal connection lost', true);
+            closeTerminal();
         });
         
+        // Send initial resize to match terminal size
+        terminalConnection.resize(currentTerminal.rows, currentTerminal.cols);
+        
         // Handle terminal input
         currentTerminal.onData(function(data) {
-            fetch(`/api/terminal/write/${currentTerminalId}`, {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({data: data})
-            });
+            terminalConnection.send(data);
         });
         
         // Handle terminal resize
         currentTerminal.onResize(function(size) {
-            fetch(`/api/terminal/resize/${currentTerminalId}`, {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({rows: size.rows, cols: size.cols})
-            });
+            terminalConnection.resize(size.rows, size.cols);
         });
         
-        // Connect to output stream
-        terminalEventSource = new EventSource(`/api/terminal/read/${currentTerminalId}`);
-        
-        terminalEventSource.onmessage = function(event) {
-            const data = JSON.parse(event.data);
-            if (data.output) {
-                currentTerminal.write(data.output);
-            }
-        };
-        
-        terminalEventSource.onerror = function() {
-            showToast('Terminal connection lost', true);
-            closeTerminal();
-        };
-        
         // Focus terminal
         currentTerminal.focus();
         
@@ -621,10 +743,10 @@ async function useSession(sessionName) {
 }
 
 async function closeTerminal() {
-    // Close event source
-    if (terminalEventSource) {
-        terminalEventSource.close();
-        terminalEventSource = null;
+    // Close the output stream
+    if (terminalConnection) {
+        terminalConnection.close();
+        terminalConnection = null;
     }
     
     // Disconnect from terminal (tmux session stays alive)
@@ -867,8 +989,38 @@ const originalRefreshStorage = refreshStorage;
 refreshStorage = async function() {
     await originalRefreshStorage();
     generateImportantLinks();
+    startStorageEvents();
 };
 
+// Storage change events (mounts, hotplugged drives) while the storage page is open
+let storageEventSource = null;
+let storageRefreshTimer = null;
+
+function startStorageEvents() {
+    if (storageEventSource) return;
+    
+    storageEventSource = new EventSource('/api/storage/events');
+    
+    storageEventSource.onmessage = function(event) {
+        const data = JSON.parse(event.data);
+        
+        if (data.type === 'device-added' && !data.settled) {
+            showToast(`New ${data.devtype || 'device'} detected: ${data.device}`);
+        }
+        
+        // Several events usually arrive together - refresh once
+        clearTimeout(storageRefreshTimer);
+        storageRefreshTimer = setTimeout(originalRefreshStorage, 300);
+    };
+}
+
+function stopStorageEvents() {
+    if (storageEventSource) {
+        storageEventSource.close();
+        storageEventSource = null;
+    }
+}
+
 // Also generate on initial page load
 window.addEventListener('DOMContentLoaded', function() {
     generateImportantLinks();